@@ -200,7 +200,7 @@ class BahaiAutonomousLauncher:
             "chromadb>=0.4.0",
             "sentence-transformers>=2.2.0",
             "openai>=1.3.0",
-            "whisper>=1.0.0"
+            "faster-whisper>=1.0.0"
         ]
         
         for req in requirements:
@@ -1,23 +1,110 @@
 import os
-import json
-import requests
-from typing import Dict, Any, List
-import ollama
-from rich.console import Console
-from rich.panel import Panel
-from rich.markdown import Markdown
+import time
+import atexit
+import random
+import asyncio
+import hashlib
+import weakref
+from collections import OrderedDict
+import orjson
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Tuple, Union
 
-console = Console()
+# httpx, ollama and rich are imported where they're first needed, so importing
+# this module (e.g. to use one provider or just the history helpers) stays cheap
+if TYPE_CHECKING:
+    import httpx
+    from rich.console import Console
+
+_console = None
+
+def _get_console() -> "Console":
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+# Read once at import; rotate the key by restarting with a new OPENROUTER_API_KEY
+_OPENROUTER_KEY = os.environ.get("OPENROUTER_API_KEY", "")
+_OPENROUTER_AUTH = f"Bearer {_OPENROUTER_KEY}"
+
+# Transient OpenRouter statuses worth retrying, with exponential backoff + jitter
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_MAX_ATTEMPTS = 5
+
+def _retry_delay(response: "httpx.Response", attempt: int) -> float:
+    """Seconds to wait before retrying, honoring a numeric Retry-After header"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(float(retry_after), 60.0)
+        except ValueError:
+            pass  # HTTP-date form: fall back to backoff
+    return min(0.5 * 2 ** attempt, 30.0) + random.random()
+
+# Shared sentence embedder for the semantic cache, loaded on first use
+_embedder = None
+
+def _get_embedder():
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        _embedder = SentenceTransformer('all-MiniLM-L6-v2')
+    return _embedder
+
+# Agents with an open HTTP client; weak so registration doesn't keep them alive
+_open_agents: "weakref.WeakSet[EnhancedAgent]" = weakref.WeakSet()
+
+@atexit.register
+def _close_open_agents():
+    for agent in list(_open_agents):
+        agent.close()
 
 class EnhancedAgent:
-    def __init__(self, provider: str = "ollama", model_name: str = None):
-        self.provider = provider
-        self.model_name = model_name or self._get_default_model()
-        self.conversation_history: List[Dict[str, str]] = []
+    # provider -> (default model, streaming call, async call)
+    _PROVIDERS = {
+        "ollama": ("qwen3-7b-instruct", "_call_ollama", "_acall_ollama"),
+        "openrouter": ("openrouter/horizon-beta", "_call_openrouter", "_acall_openrouter"),
+    }
+    
+    def __init__(self, provider: str = "ollama", model_name: str = None, concurrency: int = 64,
+                 cache_size: int = 512, max_history_turns: int = 16,
+                 semantic_cache: bool = False, semantic_threshold: float = 0.93):
+        self._set_provider(provider, model_name)
+        # Only the last max_history_turns exchanges are kept and sent, so the
+        # payload and the model's prefill stay bounded in long sessions
+        self.max_history_turns = max_history_turns
         
         # OpenRouter configuration
-        self.openrouter_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
+        self.openrouter_api_key = _OPENROUTER_KEY
         self.openrouter_url = "https://openrouter.ai/api/v1/chat/completions"
+        self._headers = {
+            "Authorization": _OPENROUTER_AUTH,
+            "Content-Type": "application/json"
+        }
+        
+        # Keep-alive HTTP/2 client, created on first OpenRouter call
+        self._hclient_instance = None
+        
+        # Async clients are created on first use and recreated if a later call
+        # runs on a different event loop (e.g. a second asyncio.run)
+        self.concurrency = concurrency
+        self._aclient = None
+        self._ollama_aclient = None
+        self._alock = None
+        self._aloop = None
+        
+        # Responses keyed on (provider, model, messages); pending async calls
+        # are stored as futures so identical concurrent prompts share one request
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Union[str, asyncio.Future]]" = OrderedDict()
+        
+        # Opt-in near-duplicate cache: (normalized embedding of the user message, reply).
+        # It matches on the message alone, so it suits FAQ-style use more than
+        # context-dependent conversations
+        self.semantic_cache = semantic_cache
+        self.semantic_threshold = semantic_threshold
+        self._embed_cache: List[Tuple[Any, str]] = []
         
         # Set system prompt based on provider
         if provider == "openrouter":
@@ -40,40 +127,152 @@ You are helpful, honest, and focused on providing accurate and useful responses.
 
 You are helpful, honest, and focused on providing accurate and useful responses."""
         
-    def _get_default_model(self) -> str:
-        """Get default model based on provider"""
-        if self.provider == "openrouter":
-            return "openrouter/horizon-beta"
-        else:
-            return "qwen3-7b-instruct"
+        # Outbound message list, mutated in place: the system prompt sits at
+        # index 0 and the conversation follows, so no per-turn copy is needed
+        self._messages: List[Dict[str, str]] = [{"role": "system", "content": self.system_prompt}]
+        
+    @property
+    def conversation_history(self) -> List[Dict[str, str]]:
+        """The conversation so far, without the system prompt."""
+        return self._messages[1:]
     
-    def _call_openrouter(self, messages: List[Dict[str, str]]) -> str:
-        """Call OpenRouter API"""
-        headers = {
-            "Authorization": f"Bearer {self.openrouter_api_key}",
-            "Content-Type": "application/json"
+    def _record_reply(self, agent_response: str):
+        """Append the assistant turn and drop the oldest exchange past the window"""
+        self._messages.append({"role": "assistant", "content": agent_response})
+        excess = len(self._messages) - 1 - 2 * self.max_history_turns
+        if excess > 0:
+            del self._messages[1:1 + excess]
+        
+    @property
+    def _hclient(self) -> "httpx.Client":
+        """Shared HTTP/2 client: repeated and concurrent calls reuse one TLS connection"""
+        if self._hclient_instance is None:
+            import httpx
+            self._hclient_instance = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+                timeout=60.0
+            )
+            _open_agents.add(self)
+        return self._hclient_instance
+    
+    def _set_provider(self, provider: str, model_name: str = None):
+        """Bind the provider's call methods once instead of branching per call"""
+        default_model, call, acall = self._PROVIDERS[provider]
+        self.provider = provider
+        self.model_name = model_name or default_model
+        self._send = getattr(self, call)
+        self._asend = getattr(self, acall)
+    
+    def _call_openrouter(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Call OpenRouter API, yielding content deltas as they arrive.
+        
+        Raises on HTTP errors or an error event in the stream, so a failure
+        after some text has been yielded can't pass for a normal reply.
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "temperature": 0.7,
+            "stream": True
         }
         
+        body = orjson.dumps(payload)
+        
+        for attempt in range(_MAX_ATTEMPTS):
+            with self._hclient.stream("POST", self.openrouter_url, headers=self._headers,
+                                      content=body) as response:
+                if response.status_code in _RETRY_STATUSES and attempt < _MAX_ATTEMPTS - 1:
+                    delay = _retry_delay(response, attempt)
+                else:
+                    if response.status_code != 200:
+                        response.read()
+                        raise RuntimeError(f"{response.status_code} - {response.text}")
+                    
+                    yield from self._iter_sse_content(response)
+                    return
+            time.sleep(delay)
+    
+    @staticmethod
+    def _iter_sse_content(response: "httpx.Response") -> Iterator[str]:
+        """Yield content deltas from an OpenRouter server-sent event stream"""
+        # "data: {...}" lines, ":" comments, "data: [DONE]" at the end
+        for line in response.iter_lines():
+            if not line or not line.startswith("data: "):
+                continue
+            data = line[len("data: "):]
+            if data == "[DONE]":
+                break
+            try:
+                event = orjson.loads(data)
+            except ValueError:
+                continue
+            if event.get("error"):
+                error = event["error"]
+                raise RuntimeError(error.get("message", error) if isinstance(error, dict) else error)
+            choices = event.get("choices") or []
+            if not choices:
+                continue
+            content = (choices[0].get("delta") or {}).get("content")
+            if content:
+                yield content
+    
+    def _call_ollama(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Call Ollama API, yielding content chunks as they arrive"""
+        import ollama
+        for chunk in ollama.chat(
+            model=self.model_name,
+            messages=messages,
+            stream=True
+        ):
+            yield chunk['message']['content']
+        
+    def _bind_loop(self):
+        """Create the async clients and history lock for the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._aloop is not loop:
+            # Clients from a previous loop can't be closed once it has stopped
+            import httpx
+            import ollama
+            self._aclient = httpx.AsyncClient(http2=True, timeout=60)
+            self._ollama_aclient = ollama.AsyncClient()
+            self._alock = asyncio.Lock()
+            self._aloop = loop
+    
+    async def _acall_openrouter(self, messages: List[Dict[str, str]]) -> str:
+        """Call OpenRouter API without blocking the event loop"""
+        self._bind_loop()
+        
         payload = {
             "model": self.model_name,
             "messages": messages,
             "temperature": 0.7
         }
         
+        body = orjson.dumps(payload)
+        
         try:
-            response = requests.post(self.openrouter_url, headers=headers, json=payload)
+            for attempt in range(_MAX_ATTEMPTS):
+                response = await self._aclient.post(self.openrouter_url, headers=self._headers,
+                                                    content=body)
+                if response.status_code not in _RETRY_STATUSES or attempt == _MAX_ATTEMPTS - 1:
+                    break
+                await asyncio.sleep(_retry_delay(response, attempt))
+            
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 return data['choices'][0]['message']['content']
             else:
                 return f"Error: {response.status_code} - {response.text}"
         except Exception as e:
             return f"Error: {str(e)}"
     
-    def _call_ollama(self, messages: List[Dict[str, str]]) -> str:
-        """Call Ollama API"""
+    async def _acall_ollama(self, messages: List[Dict[str, str]]) -> str:
+        """Call Ollama API without blocking the event loop"""
+        self._bind_loop()
+        
         try:
-            response = ollama.chat(
+            response = await self._ollama_aclient.chat(
                 model=self.model_name,
                 messages=messages,
                 stream=False
@@ -82,34 +281,216 @@ You are helpful, honest, and focused on providing accurate and useful responses.
         except Exception as e:
             return f"Error: {str(e)}"
         
-    def chat(self, message: str) -> str:
-        """Process a message and return the agent's response."""
+    def _cache_key(self, messages: List[Dict[str, str]]) -> str:
+        """Stable digest of the provider, model and outbound messages"""
+        raw = orjson.dumps([self.provider, self.model_name, messages], option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+    
+    def _cache_store(self, key: str, value: Union[str, asyncio.Future]):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    async def _asend_cached(self, messages: List[Dict[str, str]], send, cache: bool) -> str:
+        """Send messages with `send`, answering repeats from the cache and
+        coalescing identical in-flight requests"""
+        if not cache:
+            return await send(messages)
+        
+        key = self._cache_key(messages)
+        while True:
+            hit = self._cache.get(key)
+            if isinstance(hit, str):
+                self._cache.move_to_end(key)
+                return hit
+            if hit is None:
+                break
+            # Identical request already in flight: wait for its answer
+            try:
+                return await asyncio.shield(hit)
+            except asyncio.CancelledError:
+                if not hit.cancelled():
+                    raise  # this caller was cancelled, not the owner
+                # The owner gave up; loop round and send the request ourselves
+        
+        future = asyncio.get_running_loop().create_future()
+        self._cache_store(key, future)
         try:
-            # Add user message to history
-            self.conversation_history.append({"role": "user", "content": message})
-            
-            # Prepare the messages for the model
-            messages = [
-                {"role": "system", "content": self.system_prompt}
-            ] + self.conversation_history
+            response = await send(messages)
+        except BaseException:
+            if self._cache.get(key) is future:
+                del self._cache[key]
+            future.cancel()
+            raise
+        
+        future.set_result(response)
+        if response.startswith("Error:"):
+            if self._cache.get(key) is future:
+                del self._cache[key]
+        else:
+            self._cache_store(key, response)
+        return response
+    
+    def _embed(self, text: str):
+        """Unit-length embedding of text, so a dot product is the cosine similarity"""
+        return _get_embedder().encode(text, normalize_embeddings=True)
+    
+    def _semantic_lookup(self, query) -> Optional[str]:
+        """Cached reply for the most similar earlier message, if close enough"""
+        if not self._embed_cache:
+            return None
+        import numpy as np
+        sims = np.stack([vec for vec, _ in self._embed_cache]) @ query
+        best = int(sims.argmax())
+        if sims[best] >= self.semantic_threshold:
+            return self._embed_cache[best][1]
+        return None
+    
+    def _semantic_store(self, query, response: str):
+        self._embed_cache.append((query, response))
+        if len(self._embed_cache) > self.cache_size:
+            del self._embed_cache[0]
+    
+    def clear_cache(self):
+        """Drop all cached responses."""
+        self._cache.clear()
+        self._embed_cache.clear()
+        
+    def chat_stream(self, message: str, cache: bool = True) -> Iterator[str]:
+        """Process a message and yield the agent's response as it is generated.
+        
+        The user turn and the reply are added to the history together, and
+        only once the stream has finished cleanly. On failure the error is
+        yielded as a final "Error: ..." chunk and nothing is cached or
+        recorded; if the caller stops early the history is left untouched.
+        """
+        # The user turn goes straight onto the outbound list and is taken back
+        # off if the stream fails or the caller stops early
+        user_msg = {"role": "user", "content": message}
+        messages = self._messages
+        messages.append(user_msg)
+        
+        parts = []
+        completed = False
+        try:
+            key = self._cache_key(messages) if cache else None
+            hit = self._cache.get(key) if cache else None
+            query = similar = None
+            if cache and self.semantic_cache and not isinstance(hit, str):
+                query = self._embed(message)
+                similar = self._semantic_lookup(query)
             
-            # Get response from the appropriate provider
-            if self.provider == "openrouter":
-                agent_response = self._call_openrouter(messages)
+            if isinstance(hit, str):
+                self._cache.move_to_end(key)
+                chunks = [hit]
+            elif similar is not None:
+                chunks = [similar]
             else:
-                agent_response = self._call_ollama(messages)
-            
-            # Add agent response to history
-            self.conversation_history.append({"role": "assistant", "content": agent_response})
-            
-            return agent_response
+                chunks = self._send(messages)
             
+            for chunk in chunks:
+                parts.append(chunk)
+                yield chunk
+            completed = True
         except Exception as e:
-            return f"Error: {str(e)}"
+            # Keep the error visibly apart from any text already streamed
+            separator = "\n\n" if parts else ""
+            yield f"{separator}Error: {str(e)}"
+        finally:
+            if not completed and messages and messages[-1] is user_msg:
+                messages.pop()
+        
+        if not completed:
+            return
+        
+        agent_response = "".join(parts)
+        
+        # Leave entries owned by a pending async call for that call to fill
+        if key is not None and not isinstance(self._cache.get(key), asyncio.Future):
+            self._cache_store(key, agent_response)
+        if query is not None and similar is None:
+            self._semantic_store(query, agent_response)
+        
+        self._record_reply(agent_response)
+        
+    def chat(self, message: str, cache: bool = True) -> str:
+        """Process a message and return the agent's response."""
+        return "".join(self.chat_stream(message, cache=cache))
+    
+    async def achat(self, message: str, cache: bool = True) -> str:
+        """Async version of chat() for use inside an event loop.
+        
+        Concurrent calls on the same agent are serialized so each user turn
+        is followed by its own reply in the history. Use achat_many() to
+        send independent prompts in parallel.
+        """
+        self._bind_loop()
+        async with self._alock:
+            try:
+                # A snapshot, since other code may touch _messages while we await
+                user_msg = {"role": "user", "content": message}
+                messages = [*self._messages, user_msg]
+                
+                agent_response = await self._asend_cached(messages, self._asend, cache)
+                
+                if not agent_response.startswith("Error:"):
+                    self._messages.append(user_msg)
+                    self._record_reply(agent_response)
+                
+                return agent_response
+                
+            except Exception as e:
+                return f"Error: {str(e)}"
+    
+    async def achat_many(self, prompts: List[str], cache: bool = True) -> List[str]:
+        """Answer independent prompts concurrently.
+        
+        Each prompt is sent on top of the current history but the answers are
+        not added to it. At most `concurrency` requests are in flight at once.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        base = list(self._messages)
+        send = self._asend
+        
+        async def ask(prompt: str) -> str:
+            async with semaphore:
+                return await self._asend_cached(base + [{"role": "user", "content": prompt}], send, cache)
+        
+        return await asyncio.gather(*(ask(prompt) for prompt in prompts))
+    
+    def close(self):
+        """Close the pooled HTTP client, if one was opened."""
+        if self._hclient_instance is not None:
+            self._hclient_instance.close()
+            self._hclient_instance = None
+        _open_agents.discard(self)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    async def aclose(self):
+        """Close the async OpenRouter and Ollama clients, if they were opened."""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+        if self._ollama_aclient is not None:
+            close = getattr(self._ollama_aclient, "close", None)
+            if close is not None:
+                await close()
+            else:
+                # Older ollama releases only expose the wrapped httpx client
+                await self._ollama_aclient._client.aclose()
+        self._aclient = None
+        self._ollama_aclient = None
+        self._alock = None
+        self._aloop = None
     
     def clear_history(self):
         """Clear the conversation history."""
-        self.conversation_history = []
+        del self._messages[1:]
     
     def get_history(self) -> List[Dict[str, str]]:
         """Get the conversation history."""
@@ -117,14 +498,36 @@ You are helpful, honest, and focused on providing accurate and useful responses.
     
     def switch_provider(self, new_provider: str):
         """Switch between Ollama and OpenRouter"""
-        if new_provider in ["ollama", "openrouter"]:
-            self.provider = new_provider
-            self.model_name = self._get_default_model()
-            console.print(f"[green]Switched to {new_provider.upper()} provider with model {self.model_name}[/green]")
+        if new_provider in self._PROVIDERS:
+            self._set_provider(new_provider)
+            _get_console().print(f"[green]Switched to {new_provider.upper()} provider with model {self.model_name}[/green]")
         else:
-            console.print(f"[red]Unsupported provider: {new_provider}[/red]")
+            _get_console().print(f"[red]Unsupported provider: {new_provider}[/red]")
+
+def _quit(agent: EnhancedAgent) -> bool:
+    return True
+
+def _clear(agent: EnhancedAgent) -> bool:
+    agent.clear_history()
+    _get_console().print("[yellow]Conversation history cleared.[/yellow]")
+    return False
+
+def _show_history(agent: EnhancedAgent) -> bool:
+    console = _get_console()
+    for msg in agent.get_history():
+        role = "You" if msg["role"] == "user" else "Agent"
+        console.print(f"\n[bold]{role}:[/bold] {msg['content']}")
+    return False
+
+# CLI command -> handler; a handler returns True to leave the REPL
+_COMMANDS = {"exit": _quit, "clear": _clear, "history": _show_history}
 
 def main():
+    from rich.panel import Panel
+    from rich.markdown import Markdown
+    from rich.live import Live
+    
+    console = _get_console()
     # Initialize the agent (default to Ollama)
     agent = EnhancedAgent(provider="ollama")
     
@@ -141,30 +544,25 @@ def main():
             # Get user input
             user_input = console.input(f"\n[bold blue]You ({agent.provider}):[/bold blue] ")
             
-            # Handle special commands
-            if user_input.lower() == 'exit':
-                break
-            elif user_input.lower() == 'clear':
-                agent.clear_history()
-                console.print("[yellow]Conversation history cleared.[/yellow]")
+            # Handle special commands (normalized once per line)
+            cmd = user_input.strip().lower()
+            head, _, tail = cmd.partition(' ')
+            if head == 'switch' and tail:
+                agent.switch_provider(tail.strip())
                 continue
-            elif user_input.lower() == 'history':
-                history = agent.get_history()
-                for msg in history:
-                    role = "You" if msg["role"] == "user" else "Agent"
-                    console.print(f"\n[bold]{role}:[/bold] {msg['content']}")
+            handler = _COMMANDS.get(cmd)
+            if handler is not None:
+                if handler(agent):
+                    break
                 continue
-            elif user_input.lower().startswith('switch '):
-                provider = user_input.lower().split(' ')[1]
-                agent.switch_provider(provider)
-                continue
-            
-            # Get agent response
-            response = agent.chat(user_input)
             
-            # Display response
+            # Render the agent response as it streams in
             console.print(f"\n[bold green]Agent ({agent.provider}):[/bold green]")
-            console.print(Markdown(response))
+            response = ""
+            with Live(Markdown(response), console=console) as live:
+                for chunk in agent.chat_stream(user_input):
+                    response += chunk
+                    live.update(Markdown(response))
             
         except KeyboardInterrupt:
             break
@@ -172,4 +570,4 @@ def main():
             console.print(f"[red]Error:[/red] {str(e)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -5,15 +5,26 @@ Interactive configuration like Goose with OpenRouter integration
 """
 
 import os
-import json
-import requests
-import webbrowser
+import re
+import orjson
 import time
 from pathlib import Path
 
+# OpenRouter keys are "sk-or-v1-" followed by 64 hex digits
+_KEY_RE = re.compile(r'sk-or-v1-[0-9a-f]{64}')
+
 class GooseStyleConfigurator:
     def __init__(self):
         self.config_file = Path(__file__).parent / "spiritual_quest_config.json"
+        # Validation, model listing and the test call all reuse one keep-alive connection
+        self._session = None
+    
+    def _get_session(self):
+        """Return the shared HTTP session, importing requests on first use"""
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        return self._session
         
     def welcome(self):
         """Display Goose-style welcome"""
@@ -62,6 +73,7 @@ class GooseStyleConfigurator:
         auth_url = "https://openrouter.ai/keys"
         
         try:
+            import webbrowser
             webbrowser.open(auth_url)
             print(f"│  Auth URL: {auth_url}")
             print("│  Waiting for you to copy your API key...")
@@ -101,6 +113,10 @@ class GooseStyleConfigurator:
     
     def validate_api_key(self, api_key):
         """Validate OpenRouter API key"""
+        # Malformed pastes fail locally instead of waiting on a network round-trip
+        if not _KEY_RE.fullmatch(api_key or ''):
+            return False
+        
         try:
             headers = {
                 'Authorization': f'Bearer {api_key}',
@@ -108,7 +124,7 @@ class GooseStyleConfigurator:
             }
             
             # Test with a simple request
-            response = requests.get(
+            response = self._get_session().get(
                 'https://openrouter.ai/api/v1/models',
                 headers=headers,
                 timeout=10
@@ -116,16 +132,11 @@ class GooseStyleConfigurator:
             
             return response.status_code == 200
             
-        except:
+        except OSError:  # requests.RequestException subclasses OSError
             return False
     
     def complete_config(self, api_key):
         """Complete configuration with model selection"""
-        print("│")
-        print("◐  Fetching available models...")
-        
-        models = self.get_available_models(api_key)
-        
         print("│")
         print("◆  Select your preferred model:")
         
@@ -145,10 +156,8 @@ class GooseStyleConfigurator:
         print("│")
         choice = input("│  Enter number (0-4) or press Enter for Horizon Beta: ").strip()
         
-        try:
-            selected_model = preferred_models[int(choice)]
-        except:
-            selected_model = preferred_models[0]
+        idx = int(choice) if choice.isdigit() and int(choice) < len(preferred_models) else 0
+        selected_model = preferred_models[idx]
         
         print(f"│  Selected: {selected_model}")
         print("│")
@@ -167,12 +176,13 @@ class GooseStyleConfigurator:
             }
         }
         
-        with open(self.config_file, 'w') as f:
-            json.dump(config, f, indent=2)
+        self.config_file.write_bytes(orjson.dumps(config, option=orjson.OPT_INDENT_2))
         
         # Set environment variables
-        os.environ['OPENROUTER_API_KEY'] = api_key
-        os.environ['SELECTED_MODEL'] = selected_model
+        os.environ.update({
+            'OPENROUTER_API_KEY': api_key,
+            'SELECTED_MODEL': selected_model
+        })
         
         print("│  ✓ Configuration complete!")
         print("│")
@@ -202,34 +212,12 @@ class GooseStyleConfigurator:
             }
         }
         
-        with open(self.config_file, 'w') as f:
-            json.dump(config, f, indent=2)
+        self.config_file.write_bytes(orjson.dumps(config, option=orjson.OPT_INDENT_2))
         
         print("│  Demo configuration created")
         print("└  Ready for autonomous launch in demo mode.")
         return config
     
-    def get_available_models(self, api_key):
-        """Get available models from OpenRouter"""
-        try:
-            headers = {
-                'Authorization': f'Bearer {api_key}',
-            }
-            
-            response = requests.get(
-                'https://openrouter.ai/api/v1/models',
-                headers=headers,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                return response.json().get('data', [])
-            
-        except:
-            pass
-        
-        return []
-    
     def test_configuration(self, config):
         """Test the configuration"""
         try:
@@ -247,7 +235,7 @@ class GooseStyleConfigurator:
                 "max_tokens": 10
             }
             
-            response = requests.post(
+            response = self._get_session().post(
                 'https://openrouter.ai/api/v1/chat/completions',
                 headers=headers,
                 json=test_data,
@@ -256,7 +244,7 @@ class GooseStyleConfigurator:
             
             return response.status_code == 200
             
-        except:
+        except (OSError, KeyError):
             return False
     
     def run_configuration(self):
@@ -272,8 +260,7 @@ class GooseStyleConfigurator:
             update = input("│  Update? (y/N): ").strip().lower()
             
             if update != 'y':
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
+                config = orjson.loads(self.config_file.read_bytes())
                 print("│  Using existing configuration")
                 print("└  Configuration loaded successfully!")
                 return config
@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for running main:app with several Uvicorn workers
+
+    cd backend && gunicorn -c gunicorn.conf.py
+
+The app is imported once in the master with the models preloaded, then forked,
+so workers share the Whisper and embedding weights instead of each loading a copy.
+"""
+
+import multiprocessing
+import os
+
+# Read by main.py at import time
+os.environ.setdefault("PRELOAD_MODELS", "1")
+
+wsgi_app = "main:app"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+preload_app = True
+timeout = 120
+graceful_timeout = 30
+
+def post_fork(server, worker):
+    # Threads don't survive fork: each worker needs its own log listener thread
+    import main
+    main._log_listener.start()
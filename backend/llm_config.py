@@ -5,81 +5,229 @@ Provides configurable AI model selection and routing
 """
 
 import os
-import json
-import requests
-import subprocess
-from typing import Dict, Any, List, Optional, Union
-from enum import Enum
+import time
+import asyncio
+import functools
+import hashlib
+import threading
+import httpx
+import orjson
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple, Union
+from enum import IntEnum
 import logging
 
 logger = logging.getLogger(__name__)
 
-class LLMProvider(Enum):
-    LOCAL_GPT = "local_gpt"
-    OLLAMA = "ollama"
-    OPENROUTER_HORIZON = "openrouter_horizon"
-    HYBRID_EDGE = "hybrid_edge"  # Uses both local and cloud for edge encoding
+# Every provider call runs on one long-lived background event loop, which owns the
+# single pooled HTTP client. Callers on other loops (uvicorn) or on plain threads
+# (SpiritualGuideAgent.chat on RAG_POOL) hand their coroutines over to it, so
+# TCP/TLS connections are reused across queries and never tied to a dead loop.
+_encoder_loop: Optional[asyncio.AbstractEventLoop] = None
+_encoder_loop_lock = threading.Lock()
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _get_encoder_loop() -> asyncio.AbstractEventLoop:
+    """Return the background encoder loop, starting its thread on first use"""
+    global _encoder_loop
+    with _encoder_loop_lock:
+        if _encoder_loop is None:
+            _encoder_loop = asyncio.new_event_loop()
+            threading.Thread(target=_encoder_loop.run_forever, name="llm-encoder-loop", daemon=True).start()
+        return _encoder_loop
+
+def run_sync(coro):
+    """Run coro on the encoder loop from synchronous code and return its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_encoder_loop()).result()
+
+def _on_encoder_loop(method):
+    """Make an async method run on the encoder loop whichever loop awaits it"""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        loop = _get_encoder_loop()
+        if asyncio.get_running_loop() is loop:
+            return await method(*args, **kwargs)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(method(*args, **kwargs), loop))
+    return wrapper
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it on first use (encoder loop only)"""
+    global _http_client
+    if asyncio.get_running_loop() is not _encoder_loop:
+        raise RuntimeError("LLM HTTP calls must run on the encoder loop")
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=16)
+        )
+    return _http_client
+
+async def _close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+async def close_http_client():
+    """Close the shared HTTP client (call on application shutdown)"""
+    if _encoder_loop is not None:
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_close_http_client(), _encoder_loop))
+
+# Health probe results shared by every LLMConfig: url -> (checked_at, available)
+_PROBE_CACHE: Dict[str, Tuple[float, bool]] = {}
+_PROBE_TTL = 30.0
+
+async def _probe(url: str) -> bool:
+    """Return whether url answers 200, reusing a result younger than _PROBE_TTL"""
+    cached = _PROBE_CACHE.get(url)
+    now = time.monotonic()
+    if cached and now - cached[0] < _PROBE_TTL:
+        return cached[1]
+    
+    try:
+        response = await _get_http_client().get(url, timeout=2.0)
+        available = response.status_code == 200
+    except httpx.HTTPError:
+        available = False
+    
+    _PROBE_CACHE[url] = (now, available)
+    return available
+
+# Local analyses keyed by a blake2b digest of (query, context): key -> (stored_at, analysis)
+_ANALYSIS_CACHE: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_ANALYSIS_CACHE_SIZE = 1024
+_ANALYSIS_TTL = 600.0
+_ANALYSIS_MAX_CONTEXT = 4096  # longer contexts are rarely repeated; don't cache them
+
+def _parse_analysis(text: str, provider: str) -> Dict[str, Any]:
+    """Decode a model's JSON analysis, or wrap its free-text reply"""
+    # Models often answer in prose; skip the decode attempt unless it looks like an object
+    if text.lstrip()[:1] == "{":
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    return {
+        "intent": "spiritual_guidance",
+        "analysis": text,
+        "provider": provider
+    }
+
+# Constant prompt scaffolding, joined around the per-call values
+_ANALYSIS_HEAD = "Analyze this spiritual query for The Hidden Words knowledge base:\nQuery: "
+_ANALYSIS_MID = "\nContext: "
+_ANALYSIS_TAIL = """
+
+Provide analysis in JSON format:
+- intent: primary intention (spiritual_guidance, question, reflection, etc.)
+- keywords: key terms for search
+- emotional_tone: detected emotional state
+- spiritual_themes: relevant spiritual concepts
+- search_strategy: how to search the knowledge base
+"""
+
+_GUIDE_HEAD = "You are a spiritual guide for The Hidden Words by Bahá'u'lláh.\n\nOriginal Query: "
+_GUIDE_TAIL = """
+
+Using this analysis, provide a thoughtful, spiritually enriching response that draws from The Hidden Words and Baha'i teachings. Be warm, wise, and encouraging.
+"""
+
+class LLMProvider(IntEnum):
+    # Small ints so providers can index dispatch tuples directly
+    LOCAL_GPT = 0
+    OLLAMA = 1
+    OPENROUTER_HORIZON = 2
+    HYBRID_EDGE = 3  # Uses both local and cloud for edge encoding
+    
+    @property
+    def id(self) -> str:
+        """String id used by the API, such as local_gpt"""
+        return self.name.lower()
+    
+    @classmethod
+    def from_id(cls, provider_id: str) -> "LLMProvider":
+        """Look up a provider by its API id; raises ValueError if unknown"""
+        try:
+            return cls[provider_id.upper()]
+        except KeyError:
+            raise ValueError(f"Unknown LLM provider: {provider_id}") from None
+
+@dataclass(frozen=True, slots=True)
+class ProviderCfg:
+    """Static settings for one LLM provider, shared by every LLMConfig"""
+    name: str
+    description: str
+    endpoint: str = ""
+    model: str = ""
+    health_url: Optional[str] = None
+    api_key: Optional[str] = None
+
+PROVIDERS: Dict[LLMProvider, ProviderCfg] = {
+    LLMProvider.LOCAL_GPT: ProviderCfg(
+        name="Local GPT",
+        description="Local GPT instance running on your machine",
+        endpoint="http://localhost:8080/v1/chat/completions",
+        model="gpt-3.5-turbo",
+        health_url="http://localhost:8080/health"
+    ),
+    LLMProvider.OLLAMA: ProviderCfg(
+        name="Ollama",
+        description="Local Ollama with Qwen model",
+        endpoint="http://localhost:11434/api/generate",
+        model="qwen2.5:7b",
+        health_url="http://localhost:11434/api/tags"
+    ),
+    LLMProvider.OPENROUTER_HORIZON: ProviderCfg(
+        name="OpenRouter Horizon Beta",
+        description="Cutting-edge Horizon Beta via OpenRouter",
+        endpoint="https://openrouter.ai/api/v1/chat/completions",
+        model="openrouter/horizon-beta",
+        api_key=os.environ.get("OPENROUTER_API_KEY", "")
+    ),
+    LLMProvider.HYBRID_EDGE: ProviderCfg(
+        name="Hybrid Edge Encoder",
+        description="Uses local LLM for encoding, Horizon Beta for generation"
+    )
+}
 
 class LLMConfig:
     """Configuration for different LLM providers"""
     
     def __init__(self):
-        self.providers = {
-            LLMProvider.LOCAL_GPT: {
-                "name": "Local GPT",
-                "endpoint": "http://localhost:8080/v1/chat/completions",
-                "model": "gpt-3.5-turbo",
-                "available": self._check_local_gpt(),
-                "description": "Local GPT instance running on your machine"
-            },
-            LLMProvider.OLLAMA: {
-                "name": "Ollama",
-                "endpoint": "http://localhost:11434/api/generate",
-                "model": "qwen2.5:7b",
-                "available": self._check_ollama(),
-                "description": "Local Ollama with Qwen model"
-            },
-            LLMProvider.OPENROUTER_HORIZON: {
-                "name": "OpenRouter Horizon Beta",
-                "endpoint": "https://openrouter.ai/api/v1/chat/completions",
-                "model": "openrouter/horizon-beta",
-                "api_key": "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",
-                "available": True,
-                "description": "Cutting-edge Horizon Beta via OpenRouter"
-            },
-            LLMProvider.HYBRID_EDGE: {
-                "name": "Hybrid Edge Encoder",
-                "description": "Uses local LLM for encoding, Horizon Beta for generation",
-                "available": True
-            }
+        self.providers = PROVIDERS
+        # Local providers start unavailable until probed; OpenRouter needs a key
+        self.available = {
+            provider: cfg.health_url is None and cfg.api_key != ""
+            for provider, cfg in PROVIDERS.items()
         }
     
-    def _check_local_gpt(self) -> bool:
-        """Check if local GPT is running"""
-        try:
-            response = requests.get("http://localhost:8080/health", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
+    @_on_encoder_loop
+    async def is_available(self, provider: LLMProvider) -> bool:
+        """Probe a provider's health endpoint (cached for _PROBE_TTL seconds)"""
+        health_url = self.providers[provider].health_url
+        if health_url:
+            self.available[provider] = await _probe(health_url)
+        return self.available[provider]
     
-    def _check_ollama(self) -> bool:
-        """Check if Ollama is running"""
-        try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
-            return response.status_code == 200
-        except:
-            return False
+    @_on_encoder_loop
+    async def refresh_availability(self):
+        """Probe every local provider concurrently"""
+        await asyncio.gather(*(self.is_available(provider) for provider in self.providers))
     
-    def get_available_providers(self) -> List[Dict[str, Any]]:
+    @_on_encoder_loop
+    async def get_available_providers(self) -> List[Dict[str, Any]]:
         """Get list of available LLM providers"""
+        await self.refresh_availability()
         return [
             {
-                "id": provider.value,
-                "name": config["name"],
-                "description": config["description"],
-                "available": config["available"]
+                "id": provider.id,
+                "name": cfg.name,
+                "description": cfg.description,
+                "available": self.available[provider]
             }
-            for provider, config in self.providers.items()
+            for provider, cfg in self.providers.items()
         ]
 
 class EdgeEncoder:
@@ -89,7 +237,15 @@ class EdgeEncoder:
         self.config = LLMConfig()
         self.primary_provider = primary_provider
         self.fallback_provider = LLMProvider.OPENROUTER_HORIZON
+        # Local analysis callers indexed by provider (LOCAL_GPT=0, OLLAMA=1)
+        self._local_callers = (self._call_local_gpt, self._call_ollama)
+        # Seconds the hybrid encoder waits for a local analysis before settling
+        # for the speculative Horizon answer
+        self.local_analysis_grace = 2.0
+        # Upper bound on a local analysis before falling back to the basic one
+        self.local_analysis_timeout = 5.0
     
+    @_on_encoder_loop
     async def encode_query(self, query: str, context: str = "") -> Dict[str, Any]:
         """Encode query using edge LLM for preprocessing"""
         if self.primary_provider == LLMProvider.HYBRID_EDGE:
@@ -98,33 +254,102 @@ class EdgeEncoder:
             return await self._single_provider_encode(query, context, self.primary_provider)
     
     async def _hybrid_encode(self, query: str, context: str) -> Dict[str, Any]:
-        """Use local LLM for encoding, Horizon Beta for generation"""
-        # Step 1: Use local LLM for query analysis and encoding
-        local_analysis = await self._analyze_locally(query, context)
+        """Use local LLM for encoding, Horizon Beta for generation
+        
+        Horizon is started speculatively with a basic analysis while the local LLM
+        runs. If a real local analysis lands within local_analysis_grace seconds the
+        speculative call is cancelled and replaced by an enriched one; otherwise the
+        speculative answer is used, so local latency is hidden behind the Horizon RTT.
+        """
+        local_task = asyncio.create_task(self._analyze_locally(query, context))
+        speculative = asyncio.create_task(
+            self._generate_with_horizon(query, {"intent": "spiritual_guidance"})
+        )
         
-        # Step 2: Use Horizon Beta for final generation with encoded context
-        final_response = await self._generate_with_horizon(query, local_analysis)
+        try:
+            done, _ = await asyncio.wait({local_task}, timeout=self.local_analysis_grace)
+            local_analysis = local_task.result() if local_task in done else None
+            
+            if local_analysis and local_analysis.get("encoding") != "basic_fallback":
+                # Step 2: Use Horizon Beta for final generation with encoded context
+                speculative.cancel()
+                final_response = await self._generate_with_horizon(query, local_analysis)
+                providers_used = ["local", "horizon_beta"]
+            else:
+                local_task.cancel()
+                local_analysis = local_analysis or self._basic_analysis(query, context)
+                final_response = await speculative
+                providers_used = ["horizon_beta"]
+        finally:
+            for task in (local_task, speculative):
+                if not task.done():
+                    task.cancel()
         
         return {
             "query": query,
             "local_analysis": local_analysis,
             "final_response": final_response,
             "encoding_method": "hybrid_edge",
-            "providers_used": ["local", "horizon_beta"]
+            "providers_used": providers_used
         }
     
     async def _analyze_locally(self, query: str, context: str) -> Dict[str, Any]:
-        """Analyze query using local LLM"""
-        # Try Ollama first, then local GPT
-        for provider in [LLMProvider.OLLAMA, LLMProvider.LOCAL_GPT]:
-            if self.config.providers[provider]["available"]:
-                try:
-                    return await self._call_local_llm(query, context, provider)
-                except Exception as e:
-                    logger.warning(f"Local LLM {provider.value} failed: {e}")
-                    continue
+        """Analyze query locally, answering repeats from a short-lived cache"""
+        if len(context) > _ANALYSIS_MAX_CONTEXT:
+            return await self._race_local_analysis(query, context)
+        
+        key = hashlib.blake2b(f"{query}\0{context}".encode(), digest_size=16).digest()
+        now = time.monotonic()
+        hit = _ANALYSIS_CACHE.get(key)
+        if hit and now - hit[0] < _ANALYSIS_TTL:
+            _ANALYSIS_CACHE.move_to_end(key)
+            return dict(hit[1])
+        
+        analysis = await self._race_local_analysis(query, context)
+        # Basic fallbacks mean the local LLMs were down; retry them next time
+        if analysis.get("encoding") != "basic_fallback":
+            _ANALYSIS_CACHE[key] = (now, analysis)
+            _ANALYSIS_CACHE.move_to_end(key)
+            while len(_ANALYSIS_CACHE) > _ANALYSIS_CACHE_SIZE:
+                _ANALYSIS_CACHE.popitem(last=False)
+        return dict(analysis)
+    
+    async def _race_local_analysis(self, query: str, context: str) -> Dict[str, Any]:
+        """Analyze query using whichever available local LLM answers first"""
+        providers = (LLMProvider.OLLAMA, LLMProvider.LOCAL_GPT)
+        available = await asyncio.gather(*(self.config.is_available(p) for p in providers))
+        pending = {
+            asyncio.create_task(self._call_local_llm(query, context, provider)): provider
+            for provider, ok in zip(providers, available) if ok
+        }
+        deadline = time.monotonic() + self.local_analysis_timeout
+        
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, timeout=deadline - time.monotonic(),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.warning("Local LLM analysis timed out")
+                    break
+                # Ollama wins ties, as it did when the providers were tried in order
+                for task in sorted(done, key=lambda t: providers.index(pending[t])):
+                    provider = pending.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        logger.warning(f"Local LLM {provider.id} failed: {e}")
+        finally:
+            for task in pending:
+                task.cancel()
         
         # Fallback to basic analysis
+        return self._basic_analysis(query, context)
+    
+    @staticmethod
+    def _basic_analysis(query: str, context: str) -> Dict[str, Any]:
+        """Keyword-only analysis used when no local LLM answers"""
         return {
             "intent": "spiritual_guidance",
             "keywords": query.split(),
@@ -134,129 +359,95 @@ class EdgeEncoder:
     
     async def _call_local_llm(self, query: str, context: str, provider: LLMProvider) -> Dict[str, Any]:
         """Call local LLM for query analysis"""
-        config = self.config.providers[provider]
+        analysis_prompt = _ANALYSIS_HEAD + query + _ANALYSIS_MID + context + _ANALYSIS_TAIL
         
-        analysis_prompt = f"""Analyze this spiritual query for The Hidden Words knowledge base:
-Query: {query}
-Context: {context}
-
-Provide analysis in JSON format:
-- intent: primary intention (spiritual_guidance, question, reflection, etc.)
-- keywords: key terms for search
-- emotional_tone: detected emotional state
-- spiritual_themes: relevant spiritual concepts
-- search_strategy: how to search the knowledge base
-"""
-        
-        if provider == LLMProvider.OLLAMA:
-            return await self._call_ollama(analysis_prompt)
-        elif provider == LLMProvider.LOCAL_GPT:
-            return await self._call_local_gpt(analysis_prompt)
+        return await self._local_callers[provider](analysis_prompt)
     
     async def _call_ollama(self, prompt: str) -> Dict[str, Any]:
         """Call Ollama API"""
+        cfg = PROVIDERS[LLMProvider.OLLAMA]
         try:
-            response = requests.post(
-                "http://localhost:11434/api/generate",
+            response = await _get_http_client().post(
+                cfg.endpoint,
                 json={
-                    "model": "qwen2.5:7b",
+                    "model": cfg.model,
                     "prompt": prompt,
                     "stream": False
                 },
                 timeout=10
             )
-            result = response.json()
-            
-            # Try to parse JSON from response
-            try:
-                return json.loads(result.get("response", "{}"))
-            except:
-                return {
-                    "intent": "spiritual_guidance",
-                    "analysis": result.get("response", ""),
-                    "provider": "ollama"
-                }
-        except Exception as e:
+            result = orjson.loads(response.content)
+        except (httpx.HTTPError, ValueError) as e:
             raise Exception(f"Ollama call failed: {e}")
+        
+        return _parse_analysis(result.get("response", "{}"), "ollama")
     
     async def _call_local_gpt(self, prompt: str) -> Dict[str, Any]:
         """Call local GPT API"""
+        cfg = PROVIDERS[LLMProvider.LOCAL_GPT]
         try:
-            response = requests.post(
-                "http://localhost:8080/v1/chat/completions",
+            response = await _get_http_client().post(
+                cfg.endpoint,
                 headers={"Content-Type": "application/json"},
                 json={
-                    "model": "gpt-3.5-turbo",
+                    "model": cfg.model,
                     "messages": [{"role": "user", "content": prompt}],
                     "temperature": 0.3
                 },
                 timeout=10
             )
-            result = response.json()
-            content = result["choices"][0]["message"]["content"]
-            
-            # Try to parse JSON from response
-            try:
-                return json.loads(content)
-            except:
-                return {
-                    "intent": "spiritual_guidance",
-                    "analysis": content,
-                    "provider": "local_gpt"
-                }
-        except Exception as e:
+            content = orjson.loads(response.content)["choices"][0]["message"]["content"]
+        except (httpx.HTTPError, ValueError, KeyError, IndexError) as e:
             raise Exception(f"Local GPT call failed: {e}")
+        
+        return _parse_analysis(content, "local_gpt")
     
     async def _generate_with_horizon(self, query: str, analysis: Dict[str, Any]) -> str:
         """Generate final response using Horizon Beta with local analysis"""
-        config = self.config.providers[LLMProvider.OPENROUTER_HORIZON]
+        cfg = PROVIDERS[LLMProvider.OPENROUTER_HORIZON]
         
-        enhanced_prompt = f"""You are a spiritual guide for The Hidden Words by Bahá'u'lláh.
-
-Original Query: {query}
+        enhanced_prompt = (
+            _GUIDE_HEAD + query
+            + f"""
 
 Local Analysis:
 - Intent: {analysis.get('intent', 'spiritual_guidance')}
 - Keywords: {analysis.get('keywords', [])}
 - Emotional Tone: {analysis.get('emotional_tone', 'seeking')}
-- Spiritual Themes: {analysis.get('spiritual_themes', [])}
-
-Using this analysis, provide a thoughtful, spiritually enriching response that draws from The Hidden Words and Baha'i teachings. Be warm, wise, and encouraging.
-"""
+- Spiritual Themes: {analysis.get('spiritual_themes', [])}"""
+            + _GUIDE_TAIL
+        )
         
         try:
-            response = requests.post(
-                config["endpoint"],
+            response = await _get_http_client().post(
+                cfg.endpoint,
                 headers={
-                    "Authorization": f"Bearer {config['api_key']}",
+                    "Authorization": f"Bearer {cfg.api_key}",
                     "Content-Type": "application/json"
                 },
                 json={
-                    "model": config["model"],
+                    "model": cfg.model,
                     "messages": [{"role": "user", "content": enhanced_prompt}],
                     "temperature": 0.7
                 },
                 timeout=30
             )
             
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
+            return orjson.loads(response.content)["choices"][0]["message"]["content"]
             
-        except Exception as e:
+        except (httpx.HTTPError, ValueError, KeyError, IndexError) as e:
             logger.error(f"Horizon Beta call failed: {e}")
             return f"I understand you're asking about {query}. While I'm having trouble accessing my full knowledge right now, I can share that The Hidden Words teaches us about spiritual growth and divine love. Please try your question again."
     
     async def _single_provider_encode(self, query: str, context: str, provider: LLMProvider) -> Dict[str, Any]:
         """Use single provider for encoding and generation"""
-        config = self.config.providers[provider]
-        
         if provider == LLMProvider.OPENROUTER_HORIZON:
             response = await self._generate_with_horizon(query, {"intent": "spiritual_guidance"})
             return {
                 "query": query,
                 "final_response": response,
                 "encoding_method": "single_provider",
-                "provider_used": provider.value
+                "provider_used": provider.id
             }
         else:
             # For local providers, use them for both analysis and generation
@@ -266,7 +457,7 @@ Using this analysis, provide a thoughtful, spiritually enriching response that d
                 "local_analysis": analysis,
                 "final_response": analysis.get("analysis", "I'm here to help with your spiritual journey."),
                 "encoding_method": "single_provider",
-                "provider_used": provider.value
+                "provider_used": provider.id
             }
 
 # Global edge encoder instance
@@ -284,4 +475,4 @@ def set_primary_provider(provider: LLMProvider):
     """Set primary LLM provider"""
     global edge_encoder
     edge_encoder.primary_provider = provider
-    logger.info(f"Primary LLM provider set to: {provider.value}")
+    logger.info(f"Primary LLM provider set to: {provider.id}")
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+Load test for the Coordinator Agent Service (coordinator_service.py)
+
+Run against a live coordinator on port 8002:
+    locust -f locustfile.py --host http://localhost:8002 --users 100 --spawn-rate 10 --headless -t 60s
+
+Compare the p95 of /task before and after changes to the request path.
+"""
+
+from locust import HttpUser, task, between
+
+
+class CoordinatorUser(HttpUser):
+    wait_time = between(0.1, 0.5)
+
+    @task(5)
+    def ask_orchestrator(self):
+        self.client.post(
+            "/task",
+            json={"text": "hello", "target_agent": "orchestrator"},
+            name="/task [orchestrator]",
+        )
+
+    @task(1)
+    def health(self):
+        self.client.get("/health")
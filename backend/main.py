@@ -1,59 +1,174 @@
 from fastapi import FastAPI, Request, WebSocket, UploadFile, File, Form, HTTPException
-from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, ORJSONResponse
 from starlette.websockets import WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
-import qrcode
-from io import BytesIO
-import base64
-import json
-from rag_agent import SpiritualGuideAgent
-from bahai_ux_designer_agent import BahaiUXDesignerAgent
-from bahai_mcp_integration import BahaiMCPIntegration
-from llm_config import get_llm_config, set_primary_provider, LLMProvider
+from jinja2 import FileSystemBytecodeCache
+import orjson
+from llm_config import get_llm_config, get_edge_encoder, set_primary_provider, LLMProvider, close_http_client
+from semantic_cache import BatchedEmbedder, SemanticCache
+from server_common import CachedStaticFiles, WebSocketManager, qr_data_uri
 import asyncio
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
-import whisper
 import tempfile
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import anyio.to_thread
+import shutil
 import os
-import requests
+import httpx
 from typing import Optional
 import time
 from pathlib import Path
 from datetime import datetime
 import logging
-
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+import atexit
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Configure logging: request handlers only enqueue records, a listener thread
+# formats and writes them. Set LOG_LEVEL=DEBUG to log every WebSocket message.
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_log_queue = queue.SimpleQueue()
+_log_listener = QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+_queue_handler = QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # full layout is applied by the listener
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), handlers=[_queue_handler])
 logger = logging.getLogger(__name__)
 
 # Get the current directory
 BASE_DIR = Path(__file__).resolve().parent
-logger.debug(f"Base directory: {BASE_DIR}")
+logger.debug("Base directory: %s", BASE_DIR)
 
-app = FastAPI(title="Spiritual Quest")
+app = FastAPI(title="Spiritual Quest", default_response_class=ORJSONResponse)
 
 # Mount static files
-static_dir = str(BASE_DIR / "static")
-logger.debug(f"Static directory: {static_dir}")
-if not os.path.exists(static_dir):
-    logger.error(f"Static directory does not exist: {static_dir}")
-    os.makedirs(static_dir, exist_ok=True)
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+static_dir = BASE_DIR / "static"
+static_dir.mkdir(parents=True, exist_ok=True)
+app.mount("/static", CachedStaticFiles(directory=str(static_dir)), name="static")
 
 # Templates
-templates_dir = str(BASE_DIR / "templates")
-logger.debug(f"Templates directory: {templates_dir}")
-if not os.path.exists(templates_dir):
-    logger.error(f"Templates directory does not exist: {templates_dir}")
-    os.makedirs(templates_dir, exist_ok=True)
-templates = Jinja2Templates(directory=templates_dir)
-
-# Initialize agents and integrations
-rag_agent = SpiritualGuideAgent()
-ux_designer_agent = BahaiUXDesignerAgent()
-mcp_integration = BahaiMCPIntegration()
+templates_dir = BASE_DIR / "templates"
+templates_dir.mkdir(parents=True, exist_ok=True)
+templates = Jinja2Templates(directory=str(templates_dir))
+# Reuse compiled templates across restarts; templates only change on deploy
+jinja_cache_dir = BASE_DIR / ".jinja_cache"
+jinja_cache_dir.mkdir(parents=True, exist_ok=True)
+templates.env.bytecode_cache = FileSystemBytecodeCache(directory=str(jinja_cache_dir), pattern="%s.cache")
+templates.env.auto_reload = os.environ.get("UVICORN_RELOAD") == "1"
+
+# Agents, models and integrations are built on first use, so startup stays fast
+# and a process that never transcribes never loads Whisper
+def _lazy(factory):
+    """Call factory once, on first use, even when first used from several threads
+
+    Each factory has its own lock, so loading Whisper never holds up a caller
+    that only needs the UX designer. Async routes go through _aget().
+    """
+    cached = functools.lru_cache(maxsize=1)(factory)
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get():
+        with lock:
+            return cached()
+    get.loaded = lambda: cached.cache_info().currsize > 0
+    return get
+
+async def _aget(getter):
+    """Result of a _lazy getter for async code: a first-use load runs off the event loop"""
+    if getter.loaded():
+        return getter()
+    return await asyncio.to_thread(getter)
+
+@_lazy
+def get_rag_agent():
+    from rag_agent import SpiritualGuideAgent
+    encoder = get_edge_encoder()
+    provider = encoder.primary_provider
+    agent = SpiritualGuideAgent()
+    # Keep a provider chosen through /api/llm/set_provider before the agent existed
+    encoder.primary_provider = provider
+    return agent
+
+@_lazy
+def get_ux_designer_agent():
+    from bahai_ux_designer_agent import BahaiUXDesignerAgent
+    return BahaiUXDesignerAgent()
+
+@_lazy
+def get_mcp_integration():
+    from bahai_mcp_integration import BahaiMCPIntegration
+    return BahaiMCPIntegration()
+
+@_lazy
+def get_semantic_cache():
+    # Near-duplicate WebSocket questions are answered without re-running RAG
+    embedding_model = get_rag_agent().embedding_model
+    return SemanticCache(
+        embed=embedding_model.encode,
+        dim=embedding_model.get_sentence_embedding_dimension(),
+        threshold=0.95
+    )
+
+@_lazy
+def get_whisper():
+    # CTranslate2 backend with int8 weights
+    from faster_whisper import WhisperModel
+    return WhisperModel("base", device="auto", compute_type="int8")
+
+# Under gunicorn --preload (see gunicorn.conf.py) load everything in the master,
+# so forked workers share the model weights copy-on-write instead of each loading them
+if os.environ.get("PRELOAD_MODELS") == "1":
+    get_semantic_cache()
+    get_whisper()
+
+# RAG and embedding work gets its own pool so it can't starve (or be starved by)
+# the default executor that to_thread and FastAPI's sync handlers share
+RAG_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="rag")
+
+async def _run_rag(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(RAG_POOL, func, *args)
+
+def _rag_chat(message: str) -> str:
+    return get_rag_agent().chat(message)
+
+def _embed_queries(messages):
+    return get_rag_agent().embedding_model.encode(messages, normalize_embeddings=True)
+
+# Concurrent WebSocket messages are embedded together in one encoder pass
+query_embedder = BatchedEmbedder(_embed_queries, max_batch=32, window=0.005, executor=RAG_POOL)
+
+# Keep-alive connection pool to the coordinator service used by /transcribe
+coordinator_client = httpx.AsyncClient(
+    base_url="http://localhost:8002",
+    timeout=30.0,
+    limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=85)
+)
+
+@app.on_event("shutdown")
+async def close_llm_http_client():
+    """Release pooled LLM provider connections"""
+    await close_http_client()
+
+@app.on_event("startup")
+async def raise_thread_limit():
+    """Give FastAPI's sync handlers and file I/O more worker threads than anyio's default 40"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = 64
+
+@app.on_event("shutdown")
+async def shutdown_rag_pool():
+    await query_embedder.close()
+    RAG_POOL.shutdown(wait=False, cancel_futures=True)
+
+@app.on_event("shutdown")
+async def close_coordinator_client():
+    """Release pooled coordinator connections"""
+    await coordinator_client.aclose()
 
 # Add CORS middleware
 app.add_middleware(
@@ -64,59 +179,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load Whisper model
-model = whisper.load_model("base")
+def _save_upload(source, suffix: str) -> str:
+    """Copy an upload stream to a temp file in fixed-size chunks; returns its path"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        shutil.copyfileobj(source, temp_file, 1 << 20)
+        return temp_file.name
+
+def _transcribe(path: str) -> str:
+    """Transcribe an audio file (blocking; run it in a worker thread)"""
+    # Segments are decoded lazily, so they must be consumed in the worker thread too
+    segments, _ = get_whisper().transcribe(path, beam_size=1, vad_filter=True)
+    return "".join(segment.text for segment in segments).strip()
 
 # WebSocket connection settings
 WEBSOCKET_TIMEOUT = 1800  # 30 minutes for spiritual conversations
 KEEPALIVE_INTERVAL = 30  # seconds
 MAX_RETRIES = 3
 RETRY_DELAY = 1  # seconds
-
-class WebSocketManager:
-    def __init__(self):
-        self.active_connections: dict = {}
-        self.last_ping: dict = {}
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        client_id = f"{websocket.client.host}:{websocket.client.port}"
-        self.active_connections[client_id] = websocket
-        self.last_ping[client_id] = time.time()
-        logger.info(f"WebSocket connection accepted from {client_id}")
-
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-        if client_id in self.last_ping:
-            del self.last_ping[client_id]
-        logger.info(f"WebSocket connection closed for {client_id}")
-
-    async def send_message(self, client_id: str, message: str):
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_text(message)
-                return True
-            except Exception as e:
-                logger.error(f"Error sending message to {client_id}: {str(e)}")
-                self.disconnect(client_id)
-        return False
-
-    async def broadcast(self, message: str):
-        for client_id in list(self.active_connections.keys()):
-            await self.send_message(client_id, message)
-
-    def update_ping(self, client_id: str):
-        self.last_ping[client_id] = time.time()
-
-    def check_timeouts(self):
-        current_time = time.time()
-        for client_id in list(self.last_ping.keys()):
-            if current_time - self.last_ping[client_id] > WEBSOCKET_TIMEOUT:
-                logger.info(f"Client {client_id} timed out")
-                self.disconnect(client_id)
-
-manager = WebSocketManager()
+MAX_INFLIGHT_RAG = 2  # per client; timed-out RAG calls keep running on the pool
+
+# Fixed WebSocket payloads, serialized once
+PING_MESSAGE = orjson.dumps({"type": "ping"}).decode()
+PONG_MESSAGE = orjson.dumps({"type": "pong"}).decode()
+BUSY_MESSAGE = orjson.dumps({
+    "type": "busy",
+    "content": "Still working on your previous message. Please wait a moment and try again."
+}).decode()
+ERROR_MESSAGE = orjson.dumps({
+    "type": "error",
+    "content": "An error occurred while processing your message. Please try again."
+}).decode()
+
+manager = WebSocketManager(timeout=WEBSOCKET_TIMEOUT)
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
@@ -149,26 +243,14 @@ async def test_interface(request: Request):
 
 @app.get("/qr")
 async def generate_qr():
-    # Generate QR code for the local server
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data("http://localhost:8000")
-    qr.make(fit=True)
-    
-    # Create QR code image
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64
-    buffered = BytesIO()
-    img.save(buffered, format="PNG")
-    img_str = base64.b64encode(buffered.getvalue()).decode()
-    
-    return {"qr_code": f"data:image/png;base64,{img_str}"}
+    # QR code for the local server, rendered once on first request
+    return {"qr_code": qr_data_uri("http://localhost:8000")}
 
 @app.post("/api/chat")
 async def chat_endpoint(message: str = Form(...)):
     """API endpoint for chat without WebSocket"""
     try:
-        response = rag_agent.chat(message)
+        response = await _run_rag(_rag_chat, message)
         return {
             "message": message,
             "response": response,
@@ -182,16 +264,17 @@ async def chat_endpoint(message: str = Form(...)):
 async def design_endpoint(request: str = Form(...), design_type: str = Form(default="interface")):
     """API endpoint for Baha'i UX Designer Agent"""
     try:
+        designer = await _aget(get_ux_designer_agent)
         if design_type == "interface":
-            result = ux_designer_agent.design_interface(request)
+            result = designer.design_interface(request)
         elif design_type == "quote":
             # Extract quote and author if provided
             parts = request.split(" - ")
             quote = parts[0].strip('"')
             author = parts[1] if len(parts) > 1 else "Bahá'u'lláh"
-            result = ux_designer_agent.design_quote_display(quote, author)
+            result = designer.design_quote_display(quote, author)
         else:
-            result = ux_designer_agent.chat(request)
+            result = designer.chat(request)
         
         return {
             "request": request,
@@ -207,7 +290,8 @@ async def design_endpoint(request: str = Form(...), design_type: str = Form(defa
 async def deploy_endpoint(design_request: str = Form(...)):
     """Deploy a Baha'i interface to Vercel using MCP integration"""
     try:
-        result = mcp_integration.create_and_deploy_interface(design_request)
+        mcp = await _aget(get_mcp_integration)
+        result = mcp.create_and_deploy_interface(design_request)
         return {
             "design_request": design_request,
             "deployment": result,
@@ -221,7 +305,8 @@ async def deploy_endpoint(design_request: str = Form(...)):
 async def list_deployments():
     """List all deployments"""
     try:
-        deployments = mcp_integration.list_deployments()
+        mcp = await _aget(get_mcp_integration)
+        deployments = mcp.list_deployments()
         return {
             "deployments": deployments,
             "count": len(deployments),
@@ -236,10 +321,10 @@ async def get_llm_providers():
     """Get available LLM providers"""
     try:
         config = get_llm_config()
-        providers = config.get_available_providers()
+        providers = await config.get_available_providers()
         return {
             "providers": providers,
-            "current_provider": rag_agent.edge_encoder.primary_provider.value,
+            "current_provider": get_edge_encoder().primary_provider.id,
             "timestamp": datetime.now().isoformat()
         }
     except Exception as e:
@@ -251,12 +336,10 @@ async def set_llm_provider(provider: str = Form(...)):
     """Set the primary LLM provider"""
     try:
         # Convert string to enum
-        provider_enum = LLMProvider(provider)
+        provider_enum = LLMProvider.from_id(provider)
+        # The RAG agent shares this global encoder, so it picks the change up too
         set_primary_provider(provider_enum)
         
-        # Update the agent's provider too
-        rag_agent.edge_encoder.primary_provider = provider_enum
-        
         return {
             "message": f"LLM provider set to {provider}",
             "provider": provider,
@@ -271,25 +354,20 @@ async def set_llm_provider(provider: str = Form(...)):
 @app.post("/transcribe")
 async def transcribe_audio(file: UploadFile = File(...)):
     try:
-        # Save the uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".m4a") as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # Save the uploaded file temporarily, streaming it in 1 MiB chunks
+        temp_file_path = await asyncio.to_thread(_save_upload, file.file, ".m4a")
 
-        # Transcribe the audio
-        result = model.transcribe(temp_file_path)
-        transcribed_text = result["text"]
+        # Transcribe the audio off the event loop
+        transcribed_text = await asyncio.to_thread(_transcribe, temp_file_path)
 
         # Forward the transcribed text to the agent system (Coordinator)
-        coordinator_url = "http://localhost:8002/task"
         agent_payload = {
             "text": transcribed_text,
             "context": {},
             "target_agent": "orchestrator"
         }
-        agent_response = requests.post(coordinator_url, json=agent_payload, timeout=30)
-        agent_data = agent_response.json()
+        agent_response = await coordinator_client.post("/task", json=agent_payload)
+        agent_data = orjson.loads(agent_response.content)
 
         # Clean up the temporary file
         os.unlink(temp_file_path)
@@ -303,23 +381,58 @@ async def transcribe_audio(file: UploadFile = File(...)):
     except Exception as e:
         return {"error": str(e)}
 
+def _start_rag_job(conn, message: str) -> asyncio.Future:
+    """Run a RAG chat on the pool, counted against conn until its worker thread finishes"""
+    job = asyncio.ensure_future(_run_rag(_rag_chat, message))
+
+    def finished(job):
+        if conn is not None:
+            conn.inflight -= 1
+        if not job.cancelled():
+            job.exception()  # a late failure has no one waiting for it; don't warn
+
+    if conn is not None:
+        conn.inflight += 1
+    job.add_done_callback(finished)
+    return job
+
+def _client_text(raw: str) -> Optional[str]:
+    """Chat text carried by a client frame, or None for a ping
+
+    The web UI sends JSON envelopes; anything else is treated as plain text.
+    Only frames that start with "{" are worth a JSON parse.
+    """
+    if raw == "ping":
+        return None
+    if raw[:1] == "{":
+        try:
+            payload = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return raw
+        if isinstance(payload, dict):
+            if payload.get("type") == "ping":
+                return None
+            if "message" in payload:
+                return str(payload["message"])
+    return raw
+
 async def keepalive_task():
     while True:
         try:
             manager.check_timeouts()
-            await manager.broadcast(json.dumps({"type": "ping"}))
+            await manager.broadcast(PING_MESSAGE)
             await asyncio.sleep(KEEPALIVE_INTERVAL)
         except Exception as e:
-            print(f"Error in keepalive task: {str(e)}")
+            logger.error("Error in keepalive task: %s", e)
             await asyncio.sleep(1)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    client_id = f"{websocket.client.host}:{websocket.client.port}"
-    print(f"New WebSocket connection attempt from {client_id}")
+    client_id = None
+    logger.debug("New WebSocket connection attempt from %s", websocket.client)
     
     try:
-        await manager.connect(websocket)
+        client_id = await manager.connect(websocket)
         
         # Start keepalive task if not already running
         if not hasattr(app, 'keepalive_task'):
@@ -333,67 +446,81 @@ async def websocket_endpoint(websocket: WebSocket):
                     timeout=WEBSOCKET_TIMEOUT
                 )
                 
-                print(f"Received message from {client_id}: {message}")
+                logger.debug("Received message from %s: %s", client_id, message)
                 
                 # Update last ping time
                 manager.update_ping(client_id)
                 
-                # Handle ping messages
-                if message == "ping":
-                    await manager.send_message(client_id, json.dumps({"type": "pong"}))
+                # Handle ping messages, then unwrap {"type": "chat", "message": ...} frames
+                message = _client_text(message)
+                if message is None:
+                    await manager.send_message(client_id, PONG_MESSAGE)
                     continue
                 
-                # Process message with RAG agent
+                # Process message with RAG agent, unless a near-identical question was answered
                 try:
-                    response = await asyncio.wait_for(
-                        asyncio.to_thread(rag_agent.chat, message),
-                        timeout=30  # 30 second timeout for RAG processing
-                    )
+                    query_vector = await query_embedder.embed(message)
+                    semantic_cache = await _aget(get_semantic_cache)
+                    response = semantic_cache.get(query_vector)
+                    if response is None:
+                        conn = manager.connections.get(client_id)
+                        if conn is not None and conn.inflight >= MAX_INFLIGHT_RAG:
+                            await manager.send_message(client_id, BUSY_MESSAGE)
+                            continue
+                        # shield: a timeout stops the wait, but the worker thread can't be
+                        # interrupted, so the job stays counted until it really ends
+                        response = await asyncio.wait_for(
+                            asyncio.shield(_start_rag_job(conn, message)),
+                            timeout=30  # 30 second timeout for RAG processing
+                        )
+                        semantic_cache.put(query_vector, response)
                 except asyncio.TimeoutError:
                     response = "I apologize, but the request took too long to process. Please try again."
                 except Exception as e:
-                    print(f"Error in RAG processing: {str(e)}")
+                    logger.error("Error in RAG processing: %s", e)
                     response = "I apologize, but there was an error processing your request. Please try again."
                 
-                print(f"Sending response to {client_id}: {response}")
+                logger.debug("Sending response to %s: %s", client_id, response)
                 
                 # Send response back to client
                 await manager.send_message(
                     client_id,
-                    json.dumps({
+                    orjson.dumps({
                         "type": "response",
                         "content": response
-                    })
+                    }).decode()
                 )
                 
             except asyncio.TimeoutError:
-                print(f"Timeout waiting for message from {client_id}")
+                logger.info("Timeout waiting for message from %s", client_id)
                 break
             except WebSocketDisconnect:
-                print(f"Client {client_id} disconnected")
+                logger.info("Client %s disconnected", client_id)
                 break
             except Exception as e:
-                print(f"Error processing message from {client_id}: {str(e)}")
-                await manager.send_message(
-                    client_id,
-                    json.dumps({
-                        "type": "error",
-                        "content": "An error occurred while processing your message. Please try again."
-                    })
-                )
+                logger.error("Error processing message from %s: %s", client_id, e)
+                await manager.send_message(client_id, ERROR_MESSAGE)
     
     except Exception as e:
-        print(f"Unexpected error with client {client_id}: {str(e)}")
+        logger.error("Unexpected error with client %s: %s", client_id, e)
     finally:
-        manager.disconnect(client_id)
-        print(f"Connection handler closed for {client_id}")
+        if client_id is not None:
+            manager.disconnect(client_id)
+        logger.debug("Connection handler closed for %s", client_id)
 
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        # C-accelerated event loop and HTTP parser (uvicorn[standard] extras)
+        loop="uvloop",
+        http="httptools",
+        # Compress WebSocket frames (multi-KB RAG replies are plain prose)
+        ws="websockets",
+        ws_per_message_deflate=True,
+        # Auto-reload is for development only: set UVICORN_RELOAD=1
+        reload=os.environ.get("UVICORN_RELOAD") == "1",
         timeout_keep_alive=WEBSOCKET_TIMEOUT,
         timeout_graceful_shutdown=30
     )
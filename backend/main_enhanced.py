@@ -5,23 +5,24 @@ Combines FastAPI backend with Horizon Beta agents
 """
 
 from fastapi import FastAPI, Request, WebSocket, UploadFile, File, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 from fastapi.middleware.cors import CORSMiddleware
-import qrcode
-from io import BytesIO
-import base64
-import json
+import orjson
 import asyncio
+import functools
+import hashlib
 import uvicorn
 import tempfile
 import os
-import requests
+import httpx
 from typing import Optional, Dict, Any
 import time
 from pathlib import Path
 import logging
+from server_common import WebSocketManager, qr_data_uri
 from datetime import datetime
 
 # Configure logging
@@ -32,7 +33,7 @@ logger = logging.getLogger(__name__)
 BASE_DIR = Path(__file__).resolve().parent
 logger.info(f"Base directory: {BASE_DIR}")
 
-app = FastAPI(title="Multi-Agent System", version="1.0.0")
+app = FastAPI(title="Multi-Agent System", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Mount static files
 static_dir = str(BASE_DIR / "static")
@@ -45,6 +46,11 @@ templates_dir = str(BASE_DIR / "templates")
 if not os.path.exists(templates_dir):
     os.makedirs(templates_dir, exist_ok=True)
 templates = Jinja2Templates(directory=templates_dir)
+# Reuse compiled templates across restarts (shared with main.py); templates only change on deploy
+jinja_cache_dir = BASE_DIR / ".jinja_cache"
+jinja_cache_dir.mkdir(parents=True, exist_ok=True)
+templates.env.bytecode_cache = FileSystemBytecodeCache(directory=str(jinja_cache_dir), pattern="%s.cache")
+templates.env.auto_reload = os.environ.get("UVICORN_RELOAD") == "1"
 
 # Add CORS middleware
 app.add_middleware(
@@ -59,6 +65,22 @@ app.add_middleware(
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY", "")
 OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 
+@app.on_event("startup")
+async def open_http_client():
+    """Open the shared OpenRouter connection pool (app.state.http)
+
+    HTTP/2 lets concurrent agent calls multiplex over one TLS connection.
+    """
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60)
+    )
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await app.state.http.aclose()
+
 class HorizonBetaAgent:
     """Horizon Beta agent for OpenRouter integration"""
     def __init__(self, name: str, role: str, system_prompt: str = None):
@@ -68,6 +90,11 @@ class HorizonBetaAgent:
         self.api_key = OPENROUTER_API_KEY
         self.url = OPENROUTER_URL
         
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
         if system_prompt:
             self.system_prompt = system_prompt
         else:
@@ -75,11 +102,6 @@ class HorizonBetaAgent:
         
     async def chat(self, message: str) -> str:
         """Send a message to Horizon Beta"""
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": self.model,
             "messages": [
@@ -90,9 +112,9 @@ class HorizonBetaAgent:
         }
         
         try:
-            response = requests.post(self.url, headers=headers, json=payload)
+            response = await app.state.http.post(self.url, headers=self.headers, json=payload)
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 return data['choices'][0]['message']['content']
             else:
                 return f"Error: {response.status_code} - {response.text}"
@@ -128,41 +150,18 @@ agents = {
     )
 }
 
-class WebSocketManager:
-    def __init__(self):
-        self.active_connections: dict = {}
-        self.last_ping: dict = {}
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        client_id = f"{websocket.client.host}:{websocket.client.port}"
-        self.active_connections[client_id] = websocket
-        self.last_ping[client_id] = time.time()
-        logger.info(f"WebSocket connection accepted from {client_id}")
-
-    def disconnect(self, client_id: str):
-        if client_id in self.active_connections:
-            del self.active_connections[client_id]
-        if client_id in self.last_ping:
-            del self.last_ping[client_id]
-        logger.info(f"WebSocket connection closed for {client_id}")
-
-    async def send_message(self, client_id: str, message: str):
-        if client_id in self.active_connections:
-            try:
-                await self.active_connections[client_id].send_text(message)
-                return True
-            except Exception as e:
-                logger.error(f"Error sending message to {client_id}: {str(e)}")
-                self.disconnect(client_id)
-        return False
-
-    async def broadcast(self, message: str):
-        for client_id in list(self.active_connections.keys()):
-            await self.send_message(client_id, message)
-
-# Initialize WebSocket manager
-websocket_manager = WebSocketManager()
+# Initialize WebSocket manager; with REDIS_URL set, broadcasts reach clients on every worker
+websocket_manager = WebSocketManager(broadcast_url=os.environ.get("REDIS_URL"))
+
+@app.on_event("startup")
+async def start_websocket_manager():
+    await websocket_manager.start()
+
+@app.on_event("shutdown")
+async def stop_websocket_manager():
+    await websocket_manager.stop()
+
+PONG_MESSAGE = orjson.dumps({"type": "pong"}).decode()
 
 # API Endpoints
 
@@ -176,20 +175,31 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+# The agent and voice lists are fixed for the process lifetime: serialize them once
+AGENTS_PAYLOAD = orjson.dumps({
+    "agents": [
+        {
+            "id": agent_id,
+            "name": agent.name,
+            "role": agent.role,
+            "model": agent.model
+        }
+        for agent_id, agent in agents.items()
+    ]
+})
+
+VOICES_PAYLOAD = orjson.dumps({
+    "voices": [
+        {"id": "male", "name": "Male Voice", "language": "en"},
+        {"id": "female", "name": "Female Voice", "language": "en"},
+        {"id": "neutral", "name": "Neutral Voice", "language": "en"}
+    ]
+})
+
 @app.get("/api/agents")
 async def list_agents():
     """List all available agents"""
-    return {
-        "agents": [
-            {
-                "id": agent_id,
-                "name": agent.name,
-                "role": agent.role,
-                "model": agent.model
-            }
-            for agent_id, agent in agents.items()
-        ]
-    }
+    return Response(AGENTS_PAYLOAD, media_type="application/json")
 
 @app.post("/api/chat")
 async def chat_with_agent(agent_id: str, message: str):
@@ -201,13 +211,13 @@ async def chat_with_agent(agent_id: str, message: str):
     response = await agent.chat(message)
     
     # Broadcast to WebSocket clients
-    await websocket_manager.broadcast(json.dumps({
+    await websocket_manager.broadcast(orjson.dumps({
         "type": "agent_response",
         "agent": agent_id,
         "message": message,
         "response": response,
         "timestamp": datetime.now().isoformat()
-    }))
+    }).decode())
     
     return {
         "agent": agent_id,
@@ -216,6 +226,13 @@ async def chat_with_agent(agent_id: str, message: str):
         "timestamp": datetime.now().isoformat()
     }
 
+def tts_key(text: str) -> str:
+    """Content key for text's audio; stable across workers, unlike hash()
+
+    Matches the tts_<key>.mp3 names written by multi_agent_mcp.generate_tts_audio.
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
 @app.post("/api/tts/generate")
 async def generate_tts(text: str):
     """Generate TTS audio (simplified version)"""
@@ -224,20 +241,14 @@ async def generate_tts(text: str):
     return {
         "status": "success",
         "text": text,
-        "audio_url": f"/api/tts/audio/{hash(text)}.mp3",
+        "audio_url": f"/api/tts/audio/{tts_key(text)}.mp3",
         "message": "TTS generation requested successfully"
     }
 
 @app.get("/api/tts/voices")
 async def list_voices():
     """List available TTS voices"""
-    return {
-        "voices": [
-            {"id": "male", "name": "Male Voice", "language": "en"},
-            {"id": "female", "name": "Female Voice", "language": "en"},
-            {"id": "neutral", "name": "Neutral Voice", "language": "en"}
-        ]
-    }
+    return Response(VOICES_PAYLOAD, media_type="application/json")
 
 @app.post("/api/knowledge/search")
 async def search_knowledge(query: str):
@@ -262,40 +273,28 @@ async def add_to_knowledge(content: str, title: str = "Document"):
         "message": "Content added to knowledge base"
     }
 
+SERVER_URL = "http://localhost:8000"
+
+@functools.lru_cache(maxsize=8)
+def qr_payload(url: str) -> bytes:
+    """Serialized /api/qr body for url (rendered and encoded once)"""
+    return orjson.dumps({"qr_code": qr_data_uri(url), "url": url})
+
 @app.get("/api/qr")
 async def generate_qr():
     """Generate QR code for the server"""
-    server_url = "http://localhost:8000"
-    
-    # Generate QR code
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(server_url)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-    
-    return {
-        "qr_code": f"data:image/png;base64,{img_str}",
-        "url": server_url
-    }
+    return Response(qr_payload(SERVER_URL), media_type="application/json")
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time communication"""
-    client_id = f"{websocket.client.host}:{websocket.client.port}"
-    
-    await websocket_manager.connect(websocket)
+    client_id = await websocket_manager.connect(websocket)
     
     try:
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = orjson.loads(data)
             
             # Handle different message types
             if message_data.get("type") == "chat":
@@ -306,26 +305,26 @@ async def websocket_endpoint(websocket: WebSocket):
                     response = await agents[agent_id].chat(message)
                     
                     # Send response back to client
-                    await websocket.send_text(json.dumps({
+                    await websocket.send_text(orjson.dumps({
                         "type": "response",
                         "agent_id": agent_id,
                         "message": message,
                         "response": response,
                         "timestamp": datetime.now().isoformat()
-                    }))
+                    }).decode())
                     
                     # Broadcast to other clients
-                    await websocket_manager.broadcast(json.dumps({
+                    await websocket_manager.broadcast(orjson.dumps({
                         "type": "broadcast",
                         "agent_id": agent_id,
                         "message": message,
                         "response": response,
                         "timestamp": datetime.now().isoformat()
-                    }))
+                    }).decode())
             
             elif message_data.get("type") == "ping":
-                websocket_manager.last_ping[client_id] = time.time()
-                await websocket.send_text(json.dumps({"type": "pong"}))
+                websocket_manager.update_ping(client_id)
+                await websocket.send_text(PONG_MESSAGE)
                 
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
@@ -336,19 +335,18 @@ async def websocket_endpoint(websocket: WebSocket):
 async def tts_workflow(text: str):
     """Complete TTS workflow using multiple agents"""
     try:
-        # Step 1: Mobile agent validates request
-        mobile_response = await agents["mobile_expert"].chat(
-            f"User wants to convert '{text}' to speech. Should we proceed?"
-        )
-        
-        # Step 2: Backend agent validates API
-        backend_response = await agents["backend_engineer"].chat(
-            f"Validate TTS API endpoint for text: '{text}'"
-        )
-        
-        # Step 3: Audio agent processes TTS
-        audio_response = await agents["audio_handler"].chat(
-            f"Generate TTS for text: '{text}'"
+        # Steps 1-3 are independent: mobile validation, API validation and
+        # TTS processing run concurrently
+        mobile_response, backend_response, audio_response = await asyncio.gather(
+            agents["mobile_expert"].chat(
+                f"User wants to convert '{text}' to speech. Should we proceed?"
+            ),
+            agents["backend_engineer"].chat(
+                f"Validate TTS API endpoint for text: '{text}'"
+            ),
+            agents["audio_handler"].chat(
+                f"Generate TTS for text: '{text}'"
+            )
         )
         
         # Step 4: Coordinator summarizes
@@ -411,10 +409,25 @@ if __name__ == "__main__":
     for agent_id, agent in agents.items():
         logger.info(f"  - {agent_id}: {agent.name} ({agent.role})")
     
+    # Auto-reload is for development only (UVICORN_RELOAD=1). Broadcasts only reach
+    # other workers' clients through REDIS_URL, so one worker per core is the default
+    # only when it is set; WEB_CONCURRENCY overrides either way.
+    reload = os.environ.get("UVICORN_RELOAD") == "1"
+    redis_url = os.environ.get("REDIS_URL")
+    workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() if redis_url else 1))
+    if workers > 1 and not redis_url and not reload:
+        logger.warning(
+            f"Running {workers} workers without REDIS_URL: WebSocket broadcasts "
+            "will only reach clients connected to the same worker"
+        )
     uvicorn.run(
         "main_enhanced:app",
         host="127.0.0.1",
         port=8000,
-        reload=True,
+        # C-accelerated event loop and HTTP parser (uvicorn[standard] extras)
+        loop="uvloop",
+        http="httptools",
+        reload=reload,
+        workers=None if reload else workers,
         log_level="info"
     ) 
\ No newline at end of file
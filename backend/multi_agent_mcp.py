@@ -1,26 +1,39 @@
 from crewai import Agent, Crew, Task
 from langchain_community.llms import Ollama
-from typing import List, Dict
+from typing import Deque, Dict, Union
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import asyncio
+import hashlib
 import time
 import pyttsx3
 import os
-import requests
+import httpx
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 # MCP Bus: simple in-memory message/event bus with logs
 class MCPBus:
+    # run_agents runs indefinitely: keep only the most recent history
+    HISTORY_SIZE = 10_000
+
     def __init__(self):
-        self.events: List[Dict] = []
-        self.logs: List[str] = []
+        self.events: Deque[Dict] = deque(maxlen=self.HISTORY_SIZE)
+        # Sent messages are logged as their event dict and only formatted by print_logs
+        self.logs: Deque[Union[Dict, str]] = deque(maxlen=self.HISTORY_SIZE)
+        # Unread events per recipient, awaited by that recipient's task
+        self.queues: Dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
 
-    def send(self, sender, recipient, event, data=None):
+    async def send(self, sender, recipient, event, data=None):
         msg = {"from": sender, "to": recipient, "event": event, "data": data, "timestamp": time.time()}
         self.events.append(msg)
-        self.logs.append(f"{sender} → {recipient}: {event} | {data}")
+        self.logs.append(msg)
+        await self.queues[recipient].put(msg)
 
-    def get_events(self, recipient):
-        return [e for e in self.events if e["to"] == recipient]
+    async def receive(self, recipient):
+        """Wait for the next event addressed to recipient"""
+        return await self.queues[recipient].get()
 
     def log_error(self, error):
         self.logs.append(f"ERROR: {error}")
@@ -28,14 +41,21 @@ class MCPBus:
     def print_logs(self):
         print("\n--- MCP Bus Logs ---")
         for log in self.logs:
+            if isinstance(log, dict):
+                log = f"{log['from']} → {log['to']}: {log['event']} | {log['data']}"
             print(log)
 
 # Use your local OLLAMA LLM (Qwen)
 llm = Ollama(model="qwen:latest")
 
+def tts_path(text, output_dir="tts_output"):
+    """Audio file for text: named by content, so repeated text maps to the same file"""
+    digest = hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+    return os.path.join(output_dir, f"tts_{digest}.mp3")
+
 def generate_tts_audio(text, output_dir="tts_output"):
     os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, f"tts_{int(time.time())}.mp3")
+    filename = tts_path(text, output_dir)
     engine = pyttsx3.init()
     engine.save_to_file(text, filename)
     engine.runAndWait()
@@ -70,8 +90,9 @@ audio_agent = Agent(
 )
 
 class MobileFolderHandler(FileSystemEventHandler):
-    def __init__(self, bus):
+    def __init__(self, bus, loop):
         self.bus = bus
+        self.loop = loop  # watchdog calls us from its own thread
 
     def on_modified(self, event):
         if event.is_directory:
@@ -79,52 +100,101 @@ class MobileFolderHandler(FileSystemEventHandler):
         if event.src_path.endswith('.txt'):
             with open(event.src_path, 'r') as file:
                 text = file.read().strip()
-                self.bus.send("Mobile Expert", "Back-end Engineer", "tts_request", {"text": text})
+            asyncio.run_coroutine_threadsafe(
+                self.bus.send("Mobile Expert", "Back-end Engineer", "tts_request", {"text": text}),
+                self.loop
+            )
 
 # Simulate agent workflow via MCP Bus
-def run_agents():
+async def run_backend_engineer(bus, client):
+    """Step 2: Back-end agent validates TTS route"""
+    while True:
+        event = await bus.receive("Back-end Engineer")
+        if event["event"] == "tts_request":
+            text = event['data']['text']
+            try:
+                response = await client.get("http://localhost:8000/tts/validate", params={"text": text})
+            except httpx.HTTPError as e:
+                bus.log_error(f"TTS route validation failed: {e}")
+                continue
+            if response.status_code == 200:
+                await bus.send("Back-end Engineer", "Audio Handler", "tts_response_valid", {"text": text})
+            else:
+                bus.log_error(f"TTS route validation failed: {response.text}")
+
+# pyttsx3 keeps process-global driver state and runAndWait() blocks, so synthesis
+# runs in worker processes rather than on the event loop. Workers are spawned, not
+# forked: by the first job the watchdog thread and the HTTP client already exist.
+TTS_POOL = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=get_context("spawn"))
+
+# Syntheses in progress, by output file: identical texts share one job
+_tts_jobs: Dict[str, asyncio.Future] = {}
+
+async def synthesize(text):
+    filename = tts_path(text)
+    job = _tts_jobs.get(filename)
+    if job is None:
+        # Only trust an existing file when no job is still writing it
+        if os.path.exists(filename):
+            return filename
+        job = asyncio.get_running_loop().run_in_executor(TTS_POOL, generate_tts_audio, text)
+        _tts_jobs[filename] = job
+        job.add_done_callback(lambda _: _tts_jobs.pop(filename, None))
+    # shield: one waiter being cancelled mustn't cancel the job for the others
+    return await asyncio.shield(job)
+
+async def speak(bus, text):
+    try:
+        audio_file = await synthesize(text)
+    except Exception as e:
+        bus.log_error(f"TTS generation failed: {e}")
+        return
+    await bus.send("Audio Handler", "Mobile Expert", "audio_file", {"audio_file": audio_file, "text": text})
+
+async def run_audio_handler(bus):
+    """Step 3: Audio agent generates real TTS audio"""
+    jobs = set()  # keep references so running jobs aren't garbage-collected
+    while True:
+        event = await bus.receive("Audio Handler")
+        if event["event"] == "tts_response_valid":
+            # Don't wait for synthesis: several texts can be spoken at once
+            job = asyncio.create_task(speak(bus, event['data']['text']))
+            jobs.add(job)
+            job.add_done_callback(jobs.discard)
+
+async def run_mobile_expert(bus):
+    """Step 4: Mobile agent receives audio"""
+    while True:
+        event = await bus.receive("Mobile Expert")
+        if event["event"] == "audio_file":
+            print(f"Mobile Agent received audio file for: {event['data']['text']} at {event['data']['audio_file']}")
+
+async def run_agents():
     bus = MCPBus()
+    
     # Set up the Mobile Expert to watch the /mobile folder
     observer = Observer()
-    handler = MobileFolderHandler(bus)
+    handler = MobileFolderHandler(bus, asyncio.get_running_loop())
     observer.schedule(handler, path='./mobile', recursive=False)
     observer.start()
 
+    # Each agent waits on its own queue, so a message is handled as soon as it is sent
     try:
-        while True:
-            # Step 2: Back-end agent validates TTS route
-            events = bus.get_events("Back-end Engineer")
-            for event in events:
-                if event["event"] == "tts_request" and not event.get("processed"):
-                    response = requests.get("http://localhost:8000/tts/validate", params={"text": event['data']['text']})
-                    if response.status_code == 200:
-                        bus.send("Back-end Engineer", "Audio Handler", "tts_response_valid", {"text": event['data']['text']})
-                    else:
-                        bus.log_error(f"TTS route validation failed: {response.text}")
-                    event["processed"] = True
-
-            # Step 3: Audio agent generates real TTS audio
-            events = bus.get_events("Audio Handler")
-            for event in events:
-                if event["event"] == "tts_response_valid" and not event.get("processed"):
-                    audio_file = generate_tts_audio(event['data']['text'])
-                    bus.send("Audio Handler", "Mobile Expert", "audio_file", {"audio_file": audio_file, "text": event['data']['text']})
-                    event["processed"] = True
-
-            # Step 4: Mobile agent receives audio
-            events = bus.get_events("Mobile Expert")
-            for event in events:
-                if event["event"] == "audio_file" and not event.get("processed"):
-                    print(f"Mobile Agent received audio file for: {event['data']['text']} at {event['data']['audio_file']}")
-                    event["processed"] = True
-
-            time.sleep(1)
-    except KeyboardInterrupt:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            await asyncio.gather(
+                run_backend_engineer(bus, client),
+                run_audio_handler(bus),
+                run_mobile_expert(bus)
+            )
+    finally:
         observer.stop()
-    observer.join()
-
-    bus.print_logs()
+        observer.join()
+        TTS_POOL.shutdown(cancel_futures=True)
+        bus.print_logs()
 
 if __name__ == "__main__":
     print("Running MCP multi-agent simulation with real TTS...")
-    run_agents()
+    try:
+        asyncio.run(run_agents())
+    except KeyboardInterrupt:
+        pass
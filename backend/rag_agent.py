@@ -10,8 +10,7 @@ from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 import numpy as np
 import re
-import asyncio
-from llm_config import EdgeEncoder, LLMProvider, get_edge_encoder
+from llm_config import EdgeEncoder, LLMProvider, get_edge_encoder, run_sync
 
 console = Console()
 
@@ -246,16 +245,9 @@ Remember: You are a normal person having a normal conversation. The Hidden Words
             # Use edge encoder for advanced processing
             context = self._get_conversation_context()
             
-            # Use asyncio to run the async edge encoder
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                encoding_result = loop.run_until_complete(
-                    self.edge_encoder.encode_query(message, context)
-                )
-                response = encoding_result.get("final_response", "I'm here to help with your spiritual journey.")
-            finally:
-                loop.close()
+            # Run the async edge encoder on its shared background loop
+            encoding_result = run_sync(self.edge_encoder.encode_query(message, context))
+            response = encoding_result.get("final_response", "I'm here to help with your spiritual journey.")
             
             # Add response to history
             self.conversation_history.append({"role": "assistant", "content": response})
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Semantic response cache for the chat endpoints.
+Near-duplicate queries are answered from earlier responses instead of re-running RAG.
+"""
+
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+class SemanticCache:
+    """LRU of (embedding, response) pairs, bucketed with random-projection LSH
+
+    Each embedding is hashed into `num_tables` buckets by the signs of
+    `bits_per_table` random projections. A lookup only compares against entries
+    that share at least one bucket, then confirms with the exact cosine.
+    Several small tables keep recall high: a neighbour at cos 0.95 lands in a
+    shared bucket ~90% of the time with the defaults.
+    """
+
+    def __init__(self, embed: Callable[[str], np.ndarray], dim: int, threshold: float = 0.95,
+                 num_tables: int = 4, bits_per_table: int = 8, max_entries: int = 2048,
+                 seed: int = 0):
+        self._embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.num_tables = num_tables
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((num_tables * bits_per_table, dim)).astype(np.float32)
+        self._bit_weights = 1 << np.arange(bits_per_table, dtype=np.int64)
+        self._entries: "OrderedDict[int, Tuple[Tuple[int, ...], np.ndarray, str]]" = OrderedDict()
+        self._buckets: Dict[Tuple[int, int], Set[int]] = {}
+        self._next_id = 0
+
+    def embed(self, text: str) -> np.ndarray:
+        """Unit-length embedding of text (CPU-bound: call it off the event loop)"""
+        vector = np.asarray(self._embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _hash(self, vector: np.ndarray) -> Tuple[int, ...]:
+        bits = (self._planes @ vector > 0).reshape(self.num_tables, -1)
+        return tuple(int(key) for key in bits @ self._bit_weights)
+
+    def get(self, vector: np.ndarray) -> Optional[str]:
+        """Return a cached response whose query is within `threshold` cosine of vector"""
+        candidates = set()
+        for table, key in enumerate(self._hash(vector)):
+            candidates |= self._buckets.get((table, key), set())
+
+        best_id, best_sim = None, self.threshold
+        for entry_id in candidates:
+            sim = float(self._entries[entry_id][1] @ vector)
+            if sim >= best_sim:
+                best_id, best_sim = entry_id, sim
+
+        if best_id is None:
+            return None
+        self._entries.move_to_end(best_id)
+        return self._entries[best_id][2]
+
+    def put(self, vector: np.ndarray, response: str):
+        """Cache response for the query embedded as vector, evicting the oldest entry when full"""
+        keys = self._hash(vector)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (keys, vector, response)
+        for table, key in enumerate(keys):
+            self._buckets.setdefault((table, key), set()).add(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            old_id, (old_keys, _, _) = self._entries.popitem(last=False)
+            for table, key in enumerate(old_keys):
+                bucket = self._buckets[(table, key)]
+                bucket.discard(old_id)
+                if not bucket:
+                    del self._buckets[(table, key)]
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class BatchedEmbedder:
+    """Coalesces concurrent embed() calls into one batched encoder pass
+
+    The first request in a batch waits `window` seconds for others to arrive,
+    then up to `max_batch` texts are encoded together in `executor`.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], Sequence[np.ndarray]],
+                 max_batch: int = 32, window: float = 0.005, executor: Optional[Executor] = None):
+        self._encode_batch = encode_batch
+        self.max_batch = max_batch
+        self.window = window
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def embed(self, text: str) -> np.ndarray:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            await asyncio.sleep(self.window)
+            while len(items) < self.max_batch and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+
+            # Skip callers that were cancelled while waiting
+            items = [(text, future) for text, future in items if not future.done()]
+            if not items:
+                continue
+            try:
+                vectors = await loop.run_in_executor(
+                    self.executor, self._encode_batch, [text for text, _ in items]
+                )
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(items, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
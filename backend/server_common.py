@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Pieces shared by the FastAPI servers (main.py and main_enhanced.py):
+WebSocket connection tracking, cached static files and the QR code renderer.
+"""
+
+import asyncio
+import base64
+import functools
+import heapq
+import logging
+import time
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import WebSocket
+from fastapi.staticfiles import StaticFiles
+
+logger = logging.getLogger(__name__)
+
+@dataclass(slots=True)
+class ConnectionState:
+    websocket: WebSocket
+    deadline: float  # monotonic time after which the client counts as timed out
+    inflight: int = 0  # background jobs (e.g. RAG calls) still running for this client
+
+BROADCAST_CHANNEL = "websocket-broadcast"
+
+class WebSocketManager:
+    """Tracks this process's WebSocket clients
+
+    With a broadcast_url (e.g. redis://...), broadcast() publishes to a shared
+    channel and every worker relays it to its own clients, so multi-worker
+    deployments reach everyone. Call start()/stop() from startup/shutdown hooks.
+    Without one, broadcasts stay in-process.
+    """
+
+    def __init__(self, timeout: float = 1800, max_concurrent_sends: int = 256,
+                 broadcast_url: Optional[str] = None):
+        self.timeout = timeout
+        self.max_concurrent_sends = max_concurrent_sends
+        self.broadcast_url = broadcast_url
+        self.connections: Dict[str, ConnectionState] = {}
+        # (deadline, client_id) min-heap; stale entries are skipped when popped
+        self._deadlines: List[Tuple[float, str]] = []
+        self._pubsub = None
+        self._relay: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Join the shared broadcast channel, if a broadcast_url is configured"""
+        if not self.broadcast_url:
+            return
+        from broadcaster import Broadcast
+
+        self._pubsub = Broadcast(self.broadcast_url)
+        await self._pubsub.connect()
+        subscribed = asyncio.Event()
+        self._relay = asyncio.create_task(self._relay_broadcasts(subscribed))
+        # Don't accept traffic before we can hear our own publishes
+        await subscribed.wait()
+        logger.info(f"WebSocket broadcasts relayed through {self.broadcast_url.split('@')[-1]}")
+
+    async def stop(self):
+        if self._relay is not None:
+            self._relay.cancel()
+            try:
+                await self._relay
+            except asyncio.CancelledError:
+                pass
+            self._relay = None
+        if self._pubsub is not None:
+            await self._pubsub.disconnect()
+            self._pubsub = None
+
+    async def _relay_broadcasts(self, subscribed: asyncio.Event):
+        # One subscription per worker, fanned out locally, rather than one per client
+        try:
+            async with self._pubsub.subscribe(channel=BROADCAST_CHANNEL) as subscriber:
+                subscribed.set()
+                async for event in subscriber:
+                    await self._send_local(event.message)
+        except Exception as e:
+            logger.error(f"Broadcast relay stopped: {str(e)}")
+            subscribed.set()
+
+    async def connect(self, websocket: WebSocket) -> str:
+        """Accept websocket and return its client id (also kept on websocket.state)"""
+        await websocket.accept()
+        client_id = f"{websocket.client.host}:{websocket.client.port}"
+        websocket.state.client_id = client_id
+        self.connections[client_id] = ConnectionState(websocket, 0.0)
+        self.update_ping(client_id)
+        logger.info(f"WebSocket connection accepted from {client_id}")
+        return client_id
+
+    def disconnect(self, client_id: str):
+        self.connections.pop(client_id, None)
+        logger.info(f"WebSocket connection closed for {client_id}")
+
+    async def send_message(self, client_id: str, message: str):
+        conn = self.connections.get(client_id)
+        if conn is None:
+            return False
+        return await self._send(client_id, conn, message)
+
+    async def _send(self, client_id: str, conn: ConnectionState, message: str) -> bool:
+        try:
+            await conn.websocket.send_text(message)
+            return True
+        except Exception as e:
+            logger.error(f"Error sending message to {client_id}: {str(e)}")
+            self.disconnect(client_id)
+        return False
+
+    async def broadcast(self, message: str):
+        if self._pubsub is not None:
+            await self._pubsub.publish(channel=BROADCAST_CHANNEL, message=message)
+        else:
+            await self._send_local(message)
+
+    async def _send_local(self, message: str):
+        # Send to every client concurrently so one slow socket doesn't hold up the rest,
+        # but cap the sends in flight so a large fanout doesn't buffer N frames at once
+        # Coroutines are created up front, so the dict isn't iterated while sends disconnect clients
+        if len(self.connections) <= self.max_concurrent_sends:
+            await asyncio.gather(
+                *[self._send(client_id, conn, message) for client_id, conn in self.connections.items()],
+                return_exceptions=True
+            )
+            return
+
+        limit = asyncio.Semaphore(self.max_concurrent_sends)
+
+        async def send(client_id: str, conn: ConnectionState):
+            async with limit:
+                await self._send(client_id, conn, message)
+
+        await asyncio.gather(*[send(client_id, conn) for client_id, conn in self.connections.items()],
+                             return_exceptions=True)
+
+    def update_ping(self, client_id: str):
+        conn = self.connections.get(client_id)
+        if conn is None:
+            return
+        conn.deadline = time.monotonic() + self.timeout
+        heapq.heappush(self._deadlines, (conn.deadline, client_id))
+        # Every message leaves a stale entry behind; rebuild before they pile up
+        if len(self._deadlines) > 2 * len(self.connections) + 64:
+            self._deadlines = [(c.deadline, cid) for cid, c in self.connections.items()]
+            heapq.heapify(self._deadlines)
+
+    def check_timeouts(self):
+        now = time.monotonic()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, client_id = heapq.heappop(self._deadlines)
+            conn = self.connections.get(client_id)
+            # Only the entry matching the client's current deadline counts
+            if conn is not None and conn.deadline == deadline:
+                logger.info(f"Client {client_id} timed out")
+                self.disconnect(client_id)
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers cache assets instead of re-requesting them
+
+    URLs carrying a ?v= version are cached for a year as immutable; unversioned
+    ones for an hour, after which the ETag/Last-Modified revalidation applies.
+    """
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            query = b"&" + scope.get("query_string", b"")
+            if b"&v=" in query:
+                response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+            else:
+                response.headers["Cache-Control"] = "public, max-age=3600"
+        return response
+
+@functools.lru_cache(maxsize=32)
+def qr_data_uri(url: str) -> str:
+    """Render url as a base64 PNG data URI (cached: the output never changes)"""
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(url)
+    qr.make(fit=True)
+
+    # Create QR code image
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    # Convert to base64
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    img_str = base64.b64encode(buffered.getvalue()).decode()
+
+    return f"data:image/png;base64,{img_str}"
@@ -128,6 +128,8 @@ execution:
   headless: false  # Set to true for CI/CD
   browser: chromium
   timeout: 30000
+  workers: 3  # Browser contexts used to run test phases concurrently
+  process_shards: 0  # >1 runs visual checks in that many worker processes
   viewport:
     width: 1920
     height: 1080
@@ -140,6 +142,7 @@ application:
 # Visual Testing
 visual:
   enable_screenshots: true
+  screenshot_format: jpeg  # png for pixel-exact baselines
   screenshot_dir: "qa_results/screenshots"
   
 # Performance Testing
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the EnhancedAgent response cache.
+Provider calls are replaced with local fakes, so no Ollama/OpenRouter is needed.
+"""
+
+import asyncio
+
+import enhanced_agent
+from enhanced_agent import EnhancedAgent
+
+
+def _agent(**kwargs):
+    agent = EnhancedAgent(provider="ollama", **kwargs)
+    agent.close()
+    return agent
+
+
+def test_cache_key_is_stable_and_scoped():
+    agent = _agent()
+    messages = [{"role": "user", "content": "hi"}]
+
+    key = agent._cache_key(messages)
+    assert key == agent._cache_key([{"content": "hi", "role": "user"}])
+    assert len(key) == 32
+
+    agent.model_name = "other-model"
+    assert agent._cache_key(messages) != key
+
+
+def test_lru_eviction_drops_oldest():
+    agent = _agent(cache_size=2)
+    agent._cache_store("a", "1")
+    agent._cache_store("b", "2")
+    agent._cache.move_to_end("a")  # "a" was just read
+    agent._cache_store("c", "3")
+
+    assert list(agent._cache) == ["a", "c"]
+
+
+def test_repeat_prompt_served_from_cache():
+    agent = _agent()
+    calls = []
+
+    def fake_call(messages):
+        calls.append(messages)
+        yield "hello"
+
+    agent._send = fake_call
+    assert agent.chat("hi") == "hello"
+    agent.clear_history()
+    assert agent.chat("hi") == "hello"
+    assert len(calls) == 1
+
+    agent.clear_history()
+    agent.chat("hi", cache=False)
+    assert len(calls) == 2
+
+
+def test_concurrent_duplicates_share_one_request():
+    agent = _agent()
+    calls = []
+
+    async def fake_acall(messages):
+        calls.append(messages)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    agent._asend = fake_acall
+
+    async def run():
+        try:
+            return await agent.achat_many(["same", "same", "other"])
+        finally:
+            await agent.aclose()
+
+    assert asyncio.run(run()) == ["answer", "answer", "answer"]
+    assert len(calls) == 2
+
+
+def test_waiter_retries_when_owner_is_cancelled():
+    agent = _agent()
+    calls = []
+
+    async def fake_acall(messages):
+        calls.append(messages)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    agent._asend = fake_acall
+
+    async def run():
+        owner = asyncio.create_task(agent.achat_many(["z"]))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(agent.achat_many(["z"]))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        try:
+            return await waiter
+        finally:
+            await agent.aclose()
+
+    assert asyncio.run(run()) == ["answer"]
+    assert len(calls) == 2
+
+
+def test_failed_stream_is_not_cached_or_recorded():
+    agent = _agent()
+
+    def broken_call(messages):
+        yield "partial "
+        raise ConnectionError("connection reset")
+
+    agent._send = broken_call
+    assert agent.chat("hi") == "partial \n\nError: connection reset"
+    assert agent.get_history() == []
+    assert not agent._cache
+
+
+def test_openrouter_error_event_raises():
+    agent = _agent()
+    agent.switch_provider("openrouter")
+
+    class FakeResponse:
+        status_code = 200
+        headers = {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def iter_lines(self):
+            yield ": OPENROUTER PROCESSING"
+            yield 'data: {"choices": [{"delta": {"content": "par"}}]}'
+            yield "data: not json"
+            yield 'data: {"error": {"message": "upstream overloaded"}}'
+
+    agent._hclient.stream = lambda *args, **kwargs: FakeResponse()
+    assert agent.chat("hi") == "par\n\nError: upstream overloaded"
+    assert agent.get_history() == []
+
+
+def test_openrouter_retries_transient_status():
+    agent = _agent()
+    agent.switch_provider("openrouter")
+    statuses = [429, 503, 200]
+    delays = []
+
+    class FakeResponse:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.headers = {"Retry-After": "2"} if status_code == 429 else {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def iter_lines(self):
+            yield 'data: {"choices": [{"delta": {"content": "ok"}}]}'
+            yield "data: [DONE]"
+
+    agent._hclient.stream = lambda *args, **kwargs: FakeResponse(statuses.pop(0))
+    real_sleep = enhanced_agent.time.sleep
+    enhanced_agent.time.sleep = delays.append
+    try:
+        assert agent.chat("hi") == "ok"
+    finally:
+        enhanced_agent.time.sleep = real_sleep
+    assert delays[0] == 2.0
+    assert 1.0 <= delays[1] < 2.0
+
+
+def test_closing_stream_early_leaves_history_untouched():
+    agent = _agent()
+
+    def slow_call(messages):
+        yield "a"
+        yield "b"
+
+    agent._send = slow_call
+    stream = agent.chat_stream("x")
+    next(stream)
+    stream.close()
+    assert agent.get_history() == []
+
+
+def test_history_keeps_only_recent_turns():
+    agent = _agent(max_history_turns=2)
+    sent = []
+
+    def fake_call(messages):
+        sent.append(len(messages))
+        yield "ok"
+
+    agent._send = fake_call
+    for i in range(5):
+        agent.chat(f"message {i}")
+
+    # system + 2 kept exchanges + new user turn
+    assert sent[-1] == 6
+    assert [m["content"] for m in agent.get_history()][::2] == ["message 3", "message 4"]
+
+
+def test_semantic_cache_answers_near_duplicates():
+    import numpy as np
+
+    agent = _agent(semantic_cache=True, semantic_threshold=0.9)
+    vectors = {
+        "what is love": np.array([1.0, 0.0]),
+        "what is love?": np.array([0.99, 0.141]),
+        "tell me a joke": np.array([0.0, 1.0]),
+    }
+    agent._embed = lambda text: vectors[text]
+    calls = []
+
+    def fake_call(messages):
+        calls.append(messages[-1]["content"])
+        yield f"reply to {messages[-1]['content']}"
+
+    agent._send = fake_call
+    agent.chat("what is love")
+    agent.clear_history()
+    assert agent.chat("what is love?") == "reply to what is love"
+    agent.clear_history()
+    agent.chat("tell me a joke")
+    assert calls == ["what is love", "tell me a joke"]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
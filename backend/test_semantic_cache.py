@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the LSH semantic cache used by the WebSocket chat handler.
+Embeddings are fixed vectors, so no sentence-transformers model is needed.
+"""
+
+import asyncio
+
+import numpy as np
+
+from semantic_cache import BatchedEmbedder, SemanticCache
+
+
+def _cache(vectors, **kwargs):
+    return SemanticCache(embed=lambda text: vectors[text], dim=2, **kwargs)
+
+
+def test_near_duplicate_hits_and_distinct_query_misses():
+    vectors = {
+        "what is love": [1.0, 0.0],
+        "what is love?": [0.99, 0.05],
+        "tell me a joke": [0.0, 1.0],
+    }
+    cache = _cache(vectors)
+    cache.put(cache.embed("what is love"), "love answer")
+
+    assert cache.get(cache.embed("what is love?")) == "love answer"
+    assert cache.get(cache.embed("tell me a joke")) is None
+
+
+def test_embeddings_are_normalized():
+    cache = _cache({"q": [3.0, 4.0]})
+    assert np.isclose(np.linalg.norm(cache.embed("q")), 1.0)
+
+
+def test_oldest_entry_is_evicted_from_entries_and_buckets():
+    vectors = {"a": [1.0, 0.0], "b": [0.0, 1.0], "c": [-1.0, 0.0]}
+    cache = _cache(vectors, max_entries=2)
+    for text in "abc":
+        cache.put(cache.embed(text), text.upper())
+
+    assert len(cache) == 2
+    assert cache.get(cache.embed("a")) is None
+    assert cache.get(cache.embed("c")) == "C"
+    assert all(0 not in bucket for bucket in cache._buckets.values())
+
+
+def test_concurrent_embeds_share_one_batch():
+    batches = []
+
+    def encode_batch(texts):
+        batches.append(texts)
+        return [np.array([float(len(text))]) for text in texts]
+
+    async def run():
+        embedder = BatchedEmbedder(encode_batch, max_batch=2)
+        try:
+            return await asyncio.gather(*(embedder.embed(t) for t in ["a", "bb", "ccc"]))
+        finally:
+            await embedder.close()
+
+    vectors = asyncio.run(run())
+    assert [v[0] for v in vectors] == [1.0, 2.0, 3.0]
+    assert batches == [["a", "bb"], ["ccc"]]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -17,6 +17,13 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Viewports exercised by the responsive design tests
+RESPONSIVE_VIEWPORTS = {
+    "desktop": {"width": 1920, "height": 1080},
+    "tablet": {"width": 768, "height": 1024},
+    "mobile": {"width": 375, "height": 667}
+}
+
 @dataclass
 class VisualTestResult:
     """Results from visual comparison"""
@@ -33,7 +40,7 @@ class VisualTestResult:
 class VisualTestEngine:
     """Engine for performing visual testing and comparisons"""
     
-    def __init__(self, results_dir: Path):
+    def __init__(self, results_dir: Path, screenshot_format: str = "png", screenshot_quality: int = 85):
         self.results_dir = results_dir
         self.screenshots_dir = results_dir / "screenshots"
         self.baselines_dir = results_dir / "baselines"
@@ -43,33 +50,72 @@ class VisualTestEngine:
         for directory in [self.screenshots_dir, self.baselines_dir, self.diffs_dir]:
             directory.mkdir(parents=True, exist_ok=True)
         
+        # Routine captures may be jpeg (much cheaper to encode and store), but
+        # baselines are always captured and kept as lossless png so compression
+        # noise never gets baked into the reference image
+        self.screenshot_format = screenshot_format
+        self.screenshot_quality = screenshot_quality
+        
         # Visual comparison thresholds
         self.pixel_threshold = 0.2  # Maximum pixel difference (0-1)
         self.difference_threshold = 0.05  # Maximum 5% difference
         
-    async def capture_element_screenshot(self, page, selector: str, filename: str) -> Path:
+    async def capture_element_screenshot(self, page, selector: str, filename: str,
+                                         lossless: bool = False) -> Path:
         """Capture screenshot of a specific element"""
         try:
             element = page.locator(selector)
             await element.wait_for(timeout=10000)
             
-            screenshot_path = self.screenshots_dir / f"{filename}.png"
-            await element.screenshot(path=str(screenshot_path))
+            screenshot_path, options = self._screenshot_options(filename, lossless)
+            await element.screenshot(**options)
             return screenshot_path
         except Exception as e:
             logger.error(f"Failed to capture element screenshot {filename}: {e}")
             raise
 
-    async def capture_full_page_screenshot(self, page, filename: str) -> Path:
+    async def capture_full_page_screenshot(self, page, filename: str, lossless: bool = False) -> Path:
         """Capture full page screenshot"""
         try:
-            screenshot_path = self.screenshots_dir / f"{filename}.png"
-            await page.screenshot(path=str(screenshot_path), full_page=True)
+            screenshot_path, options = self._screenshot_options(filename, lossless)
+            await page.screenshot(full_page=True, **options)
             return screenshot_path
         except Exception as e:
             logger.error(f"Failed to capture full page screenshot {filename}: {e}")
             raise
 
+    def _screenshot_options(self, filename: str, lossless: bool) -> Tuple[Path, Dict[str, Any]]:
+        """Capture path and Playwright screenshot arguments (png when lossless)"""
+        if lossless or self.screenshot_format != "jpeg":
+            screenshot_path = self.screenshots_dir / f"{filename}.png"
+            return screenshot_path, {"path": str(screenshot_path), "type": "png"}
+        screenshot_path = self.screenshots_dir / f"{filename}.jpg"
+        return screenshot_path, {"path": str(screenshot_path), "type": "jpeg",
+                                 "quality": self.screenshot_quality}
+
+    def _baseline_path(self, test_name: str) -> Path:
+        # Always png: same name as the existing baselines, and lossless
+        return self.baselines_dir / f"{test_name}_baseline.png"
+
+    def _create_baseline(self, test_name: str, current_path: Path) -> VisualTestResult:
+        """Store a (lossless) capture as the baseline for test_name on first run"""
+        baseline_path = self._baseline_path(test_name)
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        import shutil
+        shutil.copy(str(current_path), str(baseline_path))
+        logger.info(f"Created baseline for {test_name}")
+        
+        return VisualTestResult(
+            test_name=test_name,
+            passed=True,
+            similarity_score=100.0,
+            difference_percentage=0.0,
+            baseline_path=str(baseline_path),
+            current_path=str(current_path),
+            diff_path="",
+            threshold_met=True
+        )
+    
     def compare_images(self, baseline_path: Path, current_path: Path, test_name: str) -> VisualTestResult:
         """Compare two images and return detailed results"""
         try:
@@ -110,7 +156,7 @@ class VisualTestEngine:
             similarity_score = 100 - difference_percentage
             
             # Create difference image
-            diff_path = self.diffs_dir / f"{test_name}_diff.png"
+            diff_path = self.diffs_dir / f"{test_name}_diff.webp"
             
             # Create colored difference image
             diff_colored = np.zeros_like(baseline)
@@ -118,7 +164,7 @@ class VisualTestEngine:
             
             # Overlay difference on original
             overlay = cv2.addWeighted(baseline, 0.7, diff_colored, 0.3, 0)
-            cv2.imwrite(str(diff_path), overlay)
+            cv2.imwrite(str(diff_path), overlay, [cv2.IMWRITE_WEBP_QUALITY, 101])  # >100 = lossless
             
             # Check if difference is within threshold
             threshold_met = difference_percentage <= self.difference_threshold * 100
@@ -152,31 +198,17 @@ class VisualTestEngine:
         """Test Persian title rendering and font display"""
         test_name = "persian_title_rendering"
         
+        # Check for baseline; without one, this capture becomes it
+        baseline_path = self._baseline_path(test_name)
+        has_baseline = baseline_path.exists()
+        
         # Capture current Persian title
         current_path = await self.capture_element_screenshot(
-            page, '.title-persian', f"{test_name}_current"
+            page, '.title-persian', f"{test_name}_current", lossless=not has_baseline
         )
         
-        # Check for baseline
-        baseline_path = self.baselines_dir / f"{test_name}_baseline.png"
-        
-        if not baseline_path.exists():
-            # Create baseline on first run
-            baseline_path.parent.mkdir(parents=True, exist_ok=True)
-            import shutil
-            shutil.copy(str(current_path), str(baseline_path))
-            logger.info(f"Created baseline for {test_name}")
-            
-            return VisualTestResult(
-                test_name=test_name,
-                passed=True,
-                similarity_score=100.0,
-                difference_percentage=0.0,
-                baseline_path=str(baseline_path),
-                current_path=str(current_path),
-                diff_path="",
-                threshold_met=True
-            )
+        if not has_baseline:
+            return self._create_baseline(test_name, current_path)
         
         return self.compare_images(baseline_path, current_path, test_name)
     
@@ -239,29 +271,17 @@ class VisualTestEngine:
             # Wait for response with quote
             await page.wait_for_selector('.hidden-word-quote', timeout=45000)
             
+            # Check baseline
+            baseline_path = self._baseline_path(test_name)
+            has_baseline = baseline_path.exists()
+            
             # Capture quote formatting
             current_path = await self.capture_element_screenshot(
-                page, '.hidden-word-quote', f"{test_name}_current"
+                page, '.hidden-word-quote', f"{test_name}_current", lossless=not has_baseline
             )
             
-            # Check baseline
-            baseline_path = self.baselines_dir / f"{test_name}_baseline.png"
-            
-            if not baseline_path.exists():
-                import shutil
-                shutil.copy(str(current_path), str(baseline_path))
-                logger.info(f"Created baseline for {test_name}")
-                
-                return VisualTestResult(
-                    test_name=test_name,
-                    passed=True,
-                    similarity_score=100.0,
-                    difference_percentage=0.0,
-                    baseline_path=str(baseline_path),
-                    current_path=str(current_path),
-                    diff_path="",
-                    threshold_met=True
-                )
+            if not has_baseline:
+                return self._create_baseline(test_name, current_path)
             
             return self.compare_images(baseline_path, current_path, test_name)
             
@@ -281,64 +301,50 @@ class VisualTestEngine:
     
     async def test_responsive_design(self, page) -> Dict[str, VisualTestResult]:
         """Test responsive design across different viewports"""
-        viewports = {
-            "desktop": {"width": 1920, "height": 1080},
-            "tablet": {"width": 768, "height": 1024},
-            "mobile": {"width": 375, "height": 667}
-        }
-        
         results = {}
         
-        for device_name, viewport in viewports.items():
-            try:
-                # Set viewport
-                await page.set_viewport_size(viewport)
-                await page.wait_for_timeout(1000)  # Let layout settle
-                
-                # Capture screenshot
-                current_path = await self.capture_full_page_screenshot(
-                    page, f"responsive_{device_name}_current"
-                )
-                
-                # Check baseline
-                baseline_path = self.baselines_dir / f"responsive_{device_name}_baseline.png"
-                
-                if not baseline_path.exists():
-                    import shutil
-                    shutil.copy(str(current_path), str(baseline_path))
-                    logger.info(f"Created baseline for responsive_{device_name}")
-                    
-                    results[device_name] = VisualTestResult(
-                        test_name=f"responsive_{device_name}",
-                        passed=True,
-                        similarity_score=100.0,
-                        difference_percentage=0.0,
-                        baseline_path=str(baseline_path),
-                        current_path=str(current_path),
-                        diff_path="",
-                        threshold_met=True
-                    )
-                else:
-                    results[device_name] = self.compare_images(
-                        baseline_path, current_path, f"responsive_{device_name}"
-                    )
-                    
-            except Exception as e:
-                logger.error(f"Responsive test failed for {device_name}: {e}")
-                results[device_name] = VisualTestResult(
-                    test_name=f"responsive_{device_name}",
-                    passed=False,
-                    similarity_score=0.0,
-                    difference_percentage=100.0,
-                    baseline_path="",
-                    current_path="",
-                    diff_path="",
-                    threshold_met=False,
-                    error_message=str(e)
-                )
+        for device_name, viewport in RESPONSIVE_VIEWPORTS.items():
+            results[device_name] = await self.test_viewport(page, device_name, viewport)
         
         return results
     
+    async def test_viewport(self, page, device_name: str, viewport: Dict[str, int]) -> VisualTestResult:
+        """Test the layout at a single viewport size"""
+        try:
+            # Set viewport
+            await page.set_viewport_size(viewport)
+            await page.wait_for_timeout(1000)  # Let layout settle
+            
+            # Check baseline
+            baseline_path = self._baseline_path(f"responsive_{device_name}")
+            has_baseline = baseline_path.exists()
+            
+            # Capture screenshot
+            current_path = await self.capture_full_page_screenshot(
+                page, f"responsive_{device_name}_current", lossless=not has_baseline
+            )
+            
+            if not has_baseline:
+                return self._create_baseline(f"responsive_{device_name}", current_path)
+            
+            return self.compare_images(
+                baseline_path, current_path, f"responsive_{device_name}"
+            )
+                
+        except Exception as e:
+            logger.error(f"Responsive test failed for {device_name}: {e}")
+            return VisualTestResult(
+                test_name=f"responsive_{device_name}",
+                passed=False,
+                similarity_score=0.0,
+                difference_percentage=100.0,
+                baseline_path="",
+                current_path="",
+                diff_path="",
+                threshold_met=False,
+                error_message=str(e)
+            )
+    
     async def test_ui_state_changes(self, page) -> Dict[str, VisualTestResult]:
         """Test visual changes during different UI states"""
         states = {
@@ -356,29 +362,17 @@ class VisualTestEngine:
                 await state_action()
                 await page.wait_for_timeout(500)  # Let state settle
                 
+                # Check baseline
+                baseline_path = self._baseline_path(f"ui_state_{state_name}")
+                has_baseline = baseline_path.exists()
+                
                 # Capture state
                 current_path = await self.capture_full_page_screenshot(
-                    page, f"ui_state_{state_name}_current"
+                    page, f"ui_state_{state_name}_current", lossless=not has_baseline
                 )
                 
-                # Check baseline
-                baseline_path = self.baselines_dir / f"ui_state_{state_name}_baseline.png"
-                
-                if not baseline_path.exists():
-                    import shutil
-                    shutil.copy(str(current_path), str(baseline_path))
-                    logger.info(f"Created baseline for ui_state_{state_name}")
-                    
-                    results[state_name] = VisualTestResult(
-                        test_name=f"ui_state_{state_name}",
-                        passed=True,
-                        similarity_score=100.0,
-                        difference_percentage=0.0,
-                        baseline_path=str(baseline_path),
-                        current_path=str(current_path),
-                        diff_path="",
-                        threshold_met=True
-                    )
+                if not has_baseline:
+                    results[state_name] = self._create_baseline(f"ui_state_{state_name}", current_path)
                 else:
                     results[state_name] = self.compare_images(
                         baseline_path, current_path, f"ui_state_{state_name}"